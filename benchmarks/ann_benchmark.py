@@ -0,0 +1,150 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+# Libs
+import numpy as np
+
+# Custom
+from src.document_stores import IVFDocumentStoreWrapper, NumpyDocumentStoreWrapper
+
+#######################################
+# Recall vs Latency - benchmark_index #
+#######################################
+
+def make_corpus(
+        num_chunks: int,
+        embedding_dim: int = 64,
+        chunks_per_cluster: int = 100,
+        noise: float = 0.8,
+        seed: int = 42,
+    ) -> Dict[str, Any]:
+    """Build a corpus of embeddings drawn around many random centroids, so that neighbours are not trivially separated
+    into a handful of topics.
+
+    Args:
+        num_chunks (int): The number of chunks.
+        embedding_dim (int): The size of the embeddings (default: 64).
+        chunks_per_cluster (int): The average number of chunks around every centroid (default: 100).
+        noise (float): The scale of the noise added to every centroid (default: 0.8).
+        seed (int): Seed for the corpus (default: 42).
+
+    Returns:
+        Dict[str, Any]: The ids, texts, sources and embeddings of the corpus.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal(size=(max(num_chunks // chunks_per_cluster, 1), embedding_dim), dtype=np.float32)
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    embeddings = centroids[rng.integers(0, len(centroids), size=num_chunks)]
+    embeddings += noise / np.sqrt(embedding_dim) * rng.standard_normal(size=embeddings.shape, dtype=np.float32)
+    ids = [f"chunk-{i}" for i in range(num_chunks)]
+    return {
+        "ids": ids,
+        "texts": ids,
+        "sources": [f"source-{s}.pdf" for s in rng.integers(0, max(num_chunks // 200, 10), size=num_chunks)],
+        "embeddings": embeddings,
+    }
+
+def timed_search(store: NumpyDocumentStoreWrapper, queries: np.ndarray, top_k: int, sources: Optional[List[str]],
+                 **kwargs) -> Dict[str, Any]:
+    start = time.perf_counter()
+    results = store.retrieve_similar_chunks_batch(queries, top_k, sources, **kwargs)
+    return {
+        "ids": [{document.id for document in documents} for documents in results],
+        "ms_per_query": 1000 * (time.perf_counter() - start) / len(queries),
+    }
+
+def benchmark_index(
+        num_chunks: int,
+        num_queries: int = 200,
+        top_k: int = 10,
+        nprobes: List[int] = (1, 2, 4, 8, 16, 32),
+        filter_share: float = 0.2,
+        seed: int = 42,
+    ) -> Dict[str, Any]:
+    """Compare the recall and latency of the IVF index at several nprobe values against exact search, with and without a
+    source filter.
+
+    Args:
+        num_chunks (int): The number of chunks in the corpus.
+        num_queries (int): The number of queries, drawn from the corpus as get_n_contexts does (default: 200).
+        top_k (int): The number of neighbours retrieved for every query (default: 10).
+        nprobes (List[int]): The nprobe values to benchmark (default: (1, 2, 4, 8, 16, 32)).
+        filter_share (float): The share of sources allowed by the source filter (default: 0.2).
+        seed (int): Seed for the corpus and the queries (default: 42).
+
+    Returns:
+        Dict[str, Any]: The build and load times, and the recall and latency of every search.
+    """
+    print(f"{num_chunks} chunks, {num_queries} queries, top {top_k}:", flush=True)
+    corpus = make_corpus(num_chunks, seed=seed)
+    rng = np.random.default_rng(seed)
+    queries = corpus["embeddings"][rng.choice(num_chunks, size=num_queries, replace=False)]
+
+    start = time.perf_counter()
+    index = IVFDocumentStoreWrapper.build(**corpus, seed=seed)
+    results: Dict[str, Any] = {"build_seconds": time.perf_counter() - start, "num_lists": len(index.centroids)}
+    with tempfile.TemporaryDirectory() as directory:
+        index.save_index(directory)
+        del index
+        start = time.perf_counter()
+        index = IVFDocumentStoreWrapper.load_index(directory)
+        results["load_seconds"] = time.perf_counter() - start
+        exact = NumpyDocumentStoreWrapper(**corpus)
+        sources = exact.get_all_sources()
+        filters = {
+            "unfiltered": None,
+            "filtered": sorted(rng.choice(sources, size=max(int(filter_share * len(sources)), 1), replace=False)),
+        }
+        print(f"  built {results['num_lists']} lists in {results['build_seconds']:.2f} s, "
+              f"loaded in {results['load_seconds']:.2f} s", flush=True)
+        for name, source_filter in filters.items():
+            truth = timed_search(exact, queries, top_k, source_filter)
+            results[name] = {"exact_ms_per_query": truth["ms_per_query"], "nprobe": {}}
+            print(f"  {name:<12}exact{truth['ms_per_query']:>10.2f} ms/query", flush=True)
+            for nprobe in nprobes:
+                approximate = timed_search(index, queries, top_k, source_filter, nprobe=nprobe)
+                recall = np.mean([
+                    len(found & expected) / max(len(expected), 1)
+                    for found, expected in zip(approximate["ids"], truth["ids"])
+                ])
+                results[name]["nprobe"][str(nprobe)] = {
+                    "recall": float(recall), "ms_per_query": approximate["ms_per_query"]
+                }
+                print(f"  {name:<12}nprobe {nprobe:<4}{approximate['ms_per_query']:>10.2f} ms/query"
+                      f"{recall:>10.3f} recall@{top_k}", flush=True)
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the recall and latency of the IVF index against exact search.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="Corpus sizes to benchmark, in chunks.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Save the results as a JSON file.")
+    args = parser.parse_args(argv)
+
+    results = {
+        str(size): benchmark_index(size, args.queries, args.top_k, args.nprobe, seed=args.seed) for size in args.sizes
+    }
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
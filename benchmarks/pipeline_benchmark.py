@@ -0,0 +1,276 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Libs
+import numpy as np
+
+# Custom
+from src.caching import ChunkVerdictStore
+from src.dataset_generation import DatasetGenerator
+from src.fakes import FakeDocumentStoreWrapper, FakeGenerator
+from src.prefilter import ChunkPreFilter
+
+#############################
+# Stage Timing - StageTimer #
+#############################
+
+class StageTimer:
+    """Runs benchmark stages one at a time, recording the wall time, peak traced memory and throughput of each."""
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        """Initialises the StageTimer class.
+
+        Args:
+            trace_memory (bool): Whether to trace the peak memory of each stage. Tracing slows down stages that
+                allocate many Python objects, so turn it off for timings that match a normal run (default: True).
+        """
+        self.trace_memory = trace_memory
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def measure(self, stage: str, func: Callable[[], Any], items: int) -> Any:
+        """Run a stage and record its wall time, peak memory and throughput.
+
+        Args:
+            stage (str): The name of the stage.
+            func (Callable): The stage to run.
+            items (int): The number of items the stage processes, used to compute throughput.
+
+        Returns:
+            Any: The result of the stage.
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        wall_time = time.perf_counter() - start
+        peak = 0
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.results[stage] = {
+            "items": items,
+            "wall_time": wall_time,
+            "peak_memory_mb": peak / (1024 * 1024),
+            "items_per_second": items / wall_time if wall_time > 0 else float("inf"),
+        }
+        print(f"  {stage:<32}{wall_time:>10.3f} s{peak / (1024 * 1024):>10.1f} MB{items:>10} items", flush=True)
+        return result
+
+#########################################
+# Pipeline Benchmark - benchmark_corpus #
+#########################################
+
+def benchmark_corpus(
+        num_chunks: int,
+        num_questions: int,
+        seed: int = 42,
+        trace_memory: bool = True,
+    ) -> Dict[str, Dict[str, float]]:
+    """Run every stage of the pipeline over a synthetic corpus against a zero-latency model, so that only the
+    framework's own overhead is measured.
+
+    Args:
+        num_chunks (int): The number of chunks in the synthetic corpus.
+        num_questions (int): The number of questions or contexts each generation stage produces.
+        seed (int): Seed for the corpus and the generator (default: 42).
+        trace_memory (bool): Whether to trace the peak memory of each stage (default: True).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Mapping of stage name to its wall time, peak memory and throughput.
+    """
+    timer = StageTimer(trace_memory=trace_memory)
+    print(f"{num_chunks} chunks, {num_questions} questions:")
+    store = timer.measure(
+        "build_corpus",
+        lambda: FakeDocumentStoreWrapper.from_synthetic(num_chunks, num_sources=max(num_chunks // 200, 10), seed=seed),
+        items=num_chunks,
+    )
+
+    def make_generator() -> DatasetGenerator:
+        # Every stage gets its own verdict store, so that no stage benefits from verdicts of the stages before it
+        return DatasetGenerator(store, FakeGenerator(), seed=seed, verdict_store=ChunkVerdictStore())
+
+    generator = make_generator()
+    timer.measure("get_all_chunks", generator.get_all_chunks, items=num_chunks)
+    train_chunks, _, _, train_sources, _, _ = timer.measure(
+        "train_val_test_split", generator.train_val_test_split, items=num_chunks
+    )
+    timer.measure(
+        "prefilter", lambda: ChunkPreFilter().reject_mask([chunk for _, chunk in train_chunks]), items=len(train_chunks)
+    )
+    timer.measure(
+        "get_n_random_chunks",
+        lambda: make_generator().get_n_random_chunks(
+            [chunk for chunk in train_chunks if len(chunk[1]) > 200], num_questions
+        ),
+        items=num_questions,
+    )
+    timer.measure(
+        "get_n_contexts",
+        lambda: make_generator().get_n_contexts(num_questions, list(train_chunks), train_sources),
+        items=num_questions,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "dataset.json")
+        timer.measure(
+            "generate_n_single_chunk_queries",
+            lambda: make_generator().generate_n_single_chunk_queries(num_questions, list(train_chunks)),
+            items=num_questions,
+        )
+        generator = make_generator()
+        dataset = timer.measure(
+            "generate_multi_context_queries",
+            lambda: generator.generate_multi_context_queries(num_questions, list(train_chunks), train_sources),
+            items=num_questions,
+        )
+        # Queries left in the dataset have already been separated, so every query is made compound again
+        compound = dataset.model_copy(deep=True)
+        compound.queries = {
+            query_id: f"{query.rstrip('?')}, and what follows from it?" for query_id, query in compound.queries.items()
+        }
+        timer.measure("separate_query", lambda: generator.separate_query(compound, None), items=len(compound.queries))
+        evolve_steps = ["reasoning_evolution", "generalizing_evolution"]
+        dataset = timer.measure(
+            "evolve_questions",
+            lambda: generator.evolve_questions(dataset, None, evolve_steps),
+            items=len(dataset.queries) * len(evolve_steps),
+        )
+        dataset = timer.measure("answer_query", lambda: generator.answer_query(dataset, None), items=len(dataset.queries))
+        timer.measure("save_json", lambda: dataset.save_json(json_path), items=len(dataset.queries))
+        timer.measure("dataset_mapping", lambda: generator.dataset_mapping(dataset), items=len(dataset.queries))
+    return timer.results
+
+def benchmark_repeats(
+        num_chunks: int,
+        num_questions: int,
+        repeats: int = 3,
+        seed: int = 42,
+        trace_memory: bool = True,
+    ) -> Dict[str, Dict[str, float]]:
+    """Run benchmark_corpus several times and keep the median wall time of every stage, so that a single slow run
+    (for eg. from garbage collection or another process) is not reported as a regression.
+
+    Args:
+        num_chunks (int): The number of chunks in the synthetic corpus.
+        num_questions (int): The number of questions or contexts each generation stage produces.
+        repeats (int): The number of runs (default: 3).
+        seed (int): Seed for the corpus and the generator (default: 42).
+        trace_memory (bool): Whether to trace the peak memory of each stage (default: True).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Mapping of stage name to its median wall time, peak memory and throughput.
+    """
+    runs = [benchmark_corpus(num_chunks, num_questions, seed, trace_memory) for _ in range(repeats)]
+    results = {}
+    for stage, first in runs[0].items():
+        wall_time = float(np.median([run[stage]["wall_time"] for run in runs]))
+        results[stage] = {
+            "items": first["items"],
+            "wall_time": wall_time,
+            "peak_memory_mb": max(run[stage]["peak_memory_mb"] for run in runs),
+            "items_per_second": first["items"] / wall_time if wall_time > 0 else float("inf"),
+        }
+    return results
+
+def compare_to_baseline(
+        results: Dict[str, Dict[str, Dict[str, float]]],
+        baseline: Dict[str, Dict[str, Dict[str, float]]],
+        tolerance: float,
+        min_seconds: float = 0.25,
+    ) -> List[str]:
+    """Compare the wall time of every stage against a saved baseline.
+
+    Args:
+        results (Dict): Benchmark results, keyed by corpus size and then by stage.
+        baseline (Dict): Baseline results in the same format.
+        tolerance (float): Stages slower than tolerance times their baseline are reported as regressions.
+        min_seconds (float): Stages faster than this in both runs are not compared, as their timings are mostly noise
+            (default: 0.25).
+
+    Returns:
+        List[str]: A description of every regression found.
+    """
+    regressions = []
+    for size, stages in results.items():
+        print(f"{size} chunks vs baseline:")
+        for stage, result in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if previous is None:
+                continue
+            ratio = result["wall_time"] / max(previous["wall_time"], 1e-9)
+            flag = ""
+            if ratio > tolerance and max(result["wall_time"], previous["wall_time"]) >= min_seconds:
+                flag = "  REGRESSION"
+                regressions.append(
+                    f"{stage} at {size} chunks: {previous['wall_time']:.3f} s -> {result['wall_time']:.3f} s"
+                )
+            print(f"  {stage:<32}{previous['wall_time']:>10.3f} s{result['wall_time']:>10.3f} s{ratio:>8.2f}x{flag}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the framework overhead of every dataset generation stage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Corpus sizes to benchmark, in chunks.")
+    parser.add_argument("--questions", type=int, default=100, help="Questions or contexts generated per stage.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Runs per corpus size. The median wall time of every stage is kept.")
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="Do not trace peak memory, which slows down stages that allocate many Python objects.")
+    parser.add_argument("--save-baseline", help="Save the results as a baseline JSON file.")
+    parser.add_argument("--baseline", help="Baseline JSON file to compare the results against.")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Stages slower than this multiple of the baseline are reported as regressions.")
+    parser.add_argument("--min-seconds", type=float, default=0.25,
+                        help="Stages faster than this in both runs are not compared, as their timings are mostly noise.")
+    args = parser.parse_args(argv)
+
+    results = {
+        str(size): benchmark_repeats(size, args.questions, args.repeats, args.seed, trace_memory=not args.skip_memory)
+        for size in args.sizes
+    }
+    if args.save_baseline:
+        directory = os.path.dirname(args.save_baseline)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "questions": args.questions,
+                "repeats": args.repeats,
+                "trace_memory": not args.skip_memory,
+                "results": results,
+            }, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("trace_memory", True) == args.skip_memory:
+            print("Warning: the baseline was run with a different --skip-memory setting, so timings are not comparable.")
+        environment = {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+        differences = [
+            f"{key} {baseline.get(key)} -> {value}" for key, value in environment.items() if baseline.get(key) != value
+        ]
+        if differences:
+            print(f"Warning: the baseline was run on a different setup ({', '.join(differences)}), save your own first.")
+        regressions = compare_to_baseline(results, baseline["results"], args.tolerance, args.min_seconds)
+        if regressions:
+            print("Regressions found:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
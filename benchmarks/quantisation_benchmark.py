@@ -0,0 +1,153 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Libs
+import numpy as np
+
+# Custom
+from src.caching import ChunkVerdictStore, EmbeddingCache
+from src.dataset_generation import DatasetGenerator
+from src.document_stores import CachedDocumentStoreWrapper, NumpyDocumentStoreWrapper
+from src.fakes import FakeDocumentStoreWrapper, FakeGenerator
+
+###########################################
+# Quantisation Accuracy - benchmark_cache #
+###########################################
+
+def make_store(num_chunks: int, embedding_dim: int, seed: int = 42) -> NumpyDocumentStoreWrapper:
+    """Build a store whose chunks are spread around a centroid for every source, with noise of varying strength, so that
+    the similarities of neighbours spread across the usual similarity thresholds.
+
+    Args:
+        num_chunks (int): The number of chunks.
+        embedding_dim (int): The size of the embeddings.
+        seed (int): Seed for the corpus (default: 42).
+
+    Returns:
+        NumpyDocumentStoreWrapper: The store with the corpus.
+    """
+    corpus = FakeDocumentStoreWrapper.from_synthetic(num_chunks, num_sources=max(num_chunks // 200, 10), seed=seed)
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal(size=(len(corpus.source_names), embedding_dim), dtype=np.float32)
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    noise = rng.uniform(0.6, 1.4, size=(num_chunks, 1)).astype(np.float32) / np.sqrt(embedding_dim)
+    embeddings = centroids[corpus.source_index] + noise * rng.standard_normal(
+        size=(num_chunks, embedding_dim), dtype=np.float32
+    )
+    return NumpyDocumentStoreWrapper(
+        corpus.ids, corpus.texts, corpus.source_names[corpus.source_index], embeddings
+    )
+
+def benchmark_cache(
+        num_chunks: int,
+        embedding_dim: int = 1024,
+        num_contexts: int = 100,
+        num_pairs_seeds: int = 500,
+        similarity_threshold: float = 0.5,
+        dtypes: List[str] = ("float16", "int8"),
+        seed: int = 42,
+    ) -> Dict[str, Any]:
+    """Report the memory saved by every embedding cache dtype, the error of the similarities computed on the compressed
+    embeddings, and how much the contexts built by get_n_contexts change compared to float32 embeddings.
+
+    Args:
+        num_chunks (int): The number of chunks in the corpus.
+        embedding_dim (int): The size of the embeddings (default: 1024).
+        num_contexts (int): The number of contexts built with every dtype (default: 100).
+        num_pairs_seeds (int): The number of seeds whose top 10 neighbours are used to measure similarity errors
+            (default: 500).
+        similarity_threshold (float): The similarity threshold used to build contexts (default: 0.5).
+        dtypes (List[str]): The cache dtypes to compare against float32 (default: ("float16", "int8")).
+        seed (int): Seed for the corpus and the generator (default: 42).
+
+    Returns:
+        Dict[str, Any]: The memory, similarity error and context changes of every dtype.
+    """
+    print(f"{num_chunks} chunks of {embedding_dim} dimensions:", flush=True)
+    store = make_store(num_chunks, embedding_dim, seed)
+    rng = np.random.default_rng(seed)
+    seeds = [(store.ids[row], store.texts[row]) for row in rng.choice(num_chunks, size=num_pairs_seeds, replace=False)]
+    seed_embeddings = store.get_chunk_embeddings(seeds)
+    neighbours = store.retrieve_similar_chunks_batch(seed_embeddings, 10, None)
+    exact_similarities = store.neighbour_similarities(seeds, seed_embeddings, neighbours)
+
+    def build_contexts(document_store_wrapper) -> List[List[str]]:
+        generator = DatasetGenerator(document_store_wrapper, FakeGenerator(), seed=seed, verdict_store=ChunkVerdictStore())
+        train_chunks, _, _, train_sources, _, _ = generator.train_val_test_split()
+        contexts = generator.get_n_contexts(
+            num_contexts, train_chunks, train_sources, similarity_threshold=similarity_threshold
+        )
+        return [[chunk_id for chunk_id, _ in context] for context in contexts]
+
+    exact_contexts = build_contexts(store)
+    results = {"float32": {"mb": store.embeddings.nbytes / (1024 * 1024), "contexts": len(exact_contexts)}}
+    print(f"  {'float32':<10}{results['float32']['mb']:>10.1f} MB{len(exact_contexts):>10} contexts", flush=True)
+    for dtype in dtypes:
+        cache = EmbeddingCache(dtype=dtype, initial_capacity=num_chunks)
+        cache.add(store.ids.tolist(), store.embeddings)
+        similarities = cache.similarities(
+            [seed[0] for seed, similar_chunks in zip(seeds, neighbours) for _ in similar_chunks],
+            [chunk.id for similar_chunks in neighbours for chunk in similar_chunks],
+        )
+        errors = np.abs(similarities - exact_similarities)
+        # Share of neighbours that land on the other side of the threshold, and so join or leave a context
+        flipped = np.mean((similarities > similarity_threshold) != (exact_similarities > similarity_threshold))
+        contexts = build_contexts(CachedDocumentStoreWrapper(store, cache))
+        overlaps = [
+            len(set(expected) & set(found)) / len(set(expected) | set(found))
+            for expected, found in zip(exact_contexts, contexts)
+        ]
+        results[dtype] = {
+            "mb": cache.nbytes / (1024 * 1024),
+            "mean_similarity_error": float(errors.mean()),
+            "max_similarity_error": float(errors.max()),
+            "threshold_flips": float(flipped),
+            "contexts": len(contexts),
+            "identical_contexts": float(np.mean([a == b for a, b in zip(exact_contexts, contexts)])),
+            "mean_context_jaccard": float(np.mean(overlaps)) if overlaps else 0.0,
+        }
+        print(
+            f"  {dtype:<10}{results[dtype]['mb']:>10.1f} MB{len(contexts):>10} contexts"
+            f"{results[dtype]['identical_contexts']:>10.1%} identical"
+            f"{results[dtype]['mean_context_jaccard']:>8.3f} jaccard"
+            f"{results[dtype]['mean_similarity_error']:>12.2e} mean error"
+            f"{results[dtype]['max_similarity_error']:>12.2e} max error"
+            f"{results[dtype]['threshold_flips']:>10.2%} flipped",
+            flush=True,
+        )
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the memory and accuracy of compressed embedding caches.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000], help="Corpus sizes to benchmark, in chunks.")
+    parser.add_argument("--dim", type=int, default=1024, help="The size of the embeddings.")
+    parser.add_argument("--contexts", type=int, default=100, help="Contexts built with every dtype.")
+    parser.add_argument("--similarity-threshold", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Save the results as a JSON file.")
+    args = parser.parse_args(argv)
+
+    results = {
+        str(size): benchmark_cache(
+            size, args.dim, args.contexts, similarity_threshold=args.similarity_threshold, seed=args.seed
+        )
+        for size in args.sizes
+    }
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
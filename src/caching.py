@@ -0,0 +1,637 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Libs
+import numpy as np
+
+##################################
+# Response Cache - ResponseCache #
+##################################
+
+class ResponseCache:
+    """On-disk cache of language model replies, stored in a local SQLite file. Replies are content-addressed by a hash
+    of the model identity, the prompt and the generation parameters, so a rerun of generate_dataset only pays for the
+    prompts that actually changed. The least recently used replies are evicted once the cache grows past max_size_mb.
+    Hits and misses are counted so that a report can be printed at the end of each run.
+    """
+
+    def __init__(
+            self,
+            path: str = os.path.join('data', 'response_cache.sqlite'),
+            max_size_mb: float = 512,
+        ) -> None:
+        """Initialises the ResponseCache class.
+
+        Args:
+            path (str): The file path of the SQLite database. It is created if it does not exist
+                (default: 'data/response_cache.sqlite').
+            max_size_mb (float): The maximum total size of cached replies in megabytes, after which the
+                least recently used entries are evicted (default: 512).
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                reply TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_accessed REAL NOT NULL
+            )"""
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_last_accessed ON responses (last_accessed)")
+        self.connection.commit()
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_identity: str, prompt: str, generation_params: Dict) -> str:
+        """Hash the model identity, prompt and generation parameters into a cache key.
+
+        Args:
+            model_identity (str): String identifying the model, for eg. its class and deployment name.
+            prompt (str): The prompt sent to the model.
+            generation_params (Dict): The generation parameters used, for eg. temperature and max_tokens.
+
+        Returns:
+            str: The hex digest used as the cache key.
+        """
+        payload = json.dumps([model_identity, prompt, generation_params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Look up cached replies for a list of keys. Every key found counts as a hit and every key missing counts as a
+        miss.
+
+        Args:
+            keys (List[str]): The cache keys to look up.
+
+        Returns:
+            Dict[str, str]: Mapping of key to cached reply, for the keys that were found.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, reply FROM responses WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update(rows)
+        if found:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE responses SET last_accessed = ? WHERE key = ?", [(now, key) for key in found]
+            )
+            self.connection.commit()
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, replies: Dict[str, str]) -> None:
+        """Store replies in the cache, evicting the least recently used entries if the cache grows too large.
+
+        Args:
+            replies (Dict[str, str]): Mapping of cache key to reply.
+        """
+        if not replies:
+            return
+        now = time.time()
+        for key, reply in replies.items():
+            size = len(reply.encode('utf-8'))
+            previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, reply, size, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, reply, size, now)
+            )
+            self.total_size += size - (previous[0] if previous else 0)
+        self.connection.commit()
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.total_size > self.max_size_bytes:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_accessed ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total_size <= self.max_size_bytes:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_size -= size
+                self.evictions += 1
+        self.connection.commit()
+
+    def reset_stats(self) -> None:
+        """Reset the hit, miss and eviction counters, for eg. at the start of a new run."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def report(self) -> str:
+        """Summarise the cache hits and misses since the counters were last reset.
+
+        Returns:
+            str: A one-line report of hits, misses, hit rate, evictions and cache size.
+        """
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return (
+            f"Response cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate), "
+            f"{self.evictions} evictions, {len(self)} entries ({self.total_size / (1024 * 1024):.1f} MB)."
+        )
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+        self.total_size = 0
+
+    def close(self) -> None:
+        """Close the connection to the SQLite database."""
+        self.connection.close()
+
+######################################
+# Chunk Verdicts - ChunkVerdictStore #
+######################################
+
+class ChunkVerdictStore:
+    """Index of chunk evaluation verdicts, keyed by chunk id and a hash of the chunk content. The DatasetGenerator checks
+    this index before asking the language model to evaluate a chunk, so popular chunks that show up as neighbours of
+    many seeds are only ever judged once. Keying on the content hash as well as the id means that a chunk whose text has
+    changed in the document store is judged again. Verdicts can be saved to and loaded from a JSON file between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Initialises the ChunkVerdictStore class. Verdicts already saved at path are loaded.
+
+        Args:
+            path (str): The JSON file to load verdicts from and save verdicts to. Verdicts are only kept in memory if
+                not provided (default: None).
+        """
+        self.path = path
+        self.verdicts: Dict[str, float] = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.verdicts = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self.verdicts)
+
+    @staticmethod
+    def make_key(chunk_id: Optional[str], chunk: str) -> str:
+        """Build the key of a chunk from its id and a hash of its content.
+
+        Args:
+            chunk_id (str): The id of the chunk in the document store, or None if unknown.
+            chunk (str): The content of the chunk.
+
+        Returns:
+            str: The key in the form of "id:content_hash".
+        """
+        content_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+        return f"{chunk_id or ''}:{content_hash}"
+
+    def get(self, chunk_id: Optional[str], chunk: str) -> Optional[float]:
+        """Get the verdict of a chunk.
+
+        Args:
+            chunk_id (str): The id of the chunk in the document store, or None if unknown.
+            chunk (str): The content of the chunk.
+
+        Returns:
+            float: The stored score of the chunk, or None if the chunk has not been evaluated.
+        """
+        return self.verdicts.get(self.make_key(chunk_id, chunk))
+
+    def set(self, chunk_id: Optional[str], chunk: str, score: float) -> None:
+        """Store the verdict of a chunk.
+
+        Args:
+            chunk_id (str): The id of the chunk in the document store, or None if unknown.
+            chunk (str): The content of the chunk.
+            score (float): The score given to the chunk by evaluate_chunk.
+        """
+        self.verdicts[self.make_key(chunk_id, chunk)] = score
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the verdicts as a JSON file.
+
+        Args:
+            path (str): The file path to save to. Defaults to the path the store was initialised with.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path provided to save chunk verdicts to.")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            json.dump(self.verdicts, f)
+
+##################################
+# Source Catalog - SourceCatalog #
+##################################
+
+class SourceCatalog:
+    """Local catalog of the sources in a collection and the number of chunks in each. Listing the sources of a large
+    collection means scanning every row, so the catalog is built once and reused until the collection changes, which is
+    detected by comparing the collection version (for eg. its name and row count) recorded when the catalog was built.
+    The catalog can be saved to and loaded from a JSON file between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Initialises the SourceCatalog class. A catalog already saved at path is loaded.
+
+        Args:
+            path (str): The JSON file to load the catalog from and save the catalog to. The catalog is only kept in
+                memory if not provided (default: None).
+        """
+        self.path = path
+        self.version: Optional[str] = None
+        self.counts: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                catalog = json.load(f)
+            self.version = catalog["version"]
+            self.counts = catalog["counts"]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def sources(self) -> List[str]:
+        """List[str]: Every source in the catalog, in sorted order."""
+        return sorted(self.counts)
+
+    def is_current(self, version: str) -> bool:
+        """Check whether the catalog was built for the given version of the collection.
+
+        Args:
+            version (str): The current version of the collection.
+
+        Returns:
+            bool: True if the catalog can be used as is, False if it has to be rebuilt.
+        """
+        return self.version is not None and self.version == version
+
+    def update(self, counts: Dict[str, int], version: str) -> None:
+        """Replace the catalog with freshly counted sources, and save it if the catalog has a path.
+
+        Args:
+            counts (Dict[str, int]): Mapping of source to its number of chunks.
+            version (str): The version of the collection the counts were taken from.
+        """
+        self.counts = dict(sorted(counts.items()))
+        self.version = version
+        if self.path:
+            self.save()
+
+    def invalidate(self) -> None:
+        """Mark the catalog as out of date, so that it is rebuilt the next time it is used."""
+        self.version = None
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the catalog as a JSON file.
+
+        Args:
+            path (str): The file path to save to. Defaults to the path the catalog was initialised with.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path provided to save the source catalog to.")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            json.dump({"version": self.version, "counts": self.counts}, f)
+
+#################################
+# Chunk Usage - ChunkUsageIndex #
+#################################
+
+class ChunkUsageIndex:
+    """Index of how many contexts every chunk has been used in, so that popular chunks which are neighbours of many
+    seeds do not end up in dozens of contexts. Once a chunk has been used max_uses_per_chunk times it is saturated, and
+    is left out of retrieval results and skipped as a seed. Every check is a single dictionary lookup. The index can be
+    saved to and loaded from a JSON file, so that incremental runs respect the usage of earlier runs.
+    """
+
+    def __init__(self, max_uses_per_chunk: Optional[int] = 3, path: Optional[str] = None) -> None:
+        """Initialises the ChunkUsageIndex class. Usage already saved at path is loaded.
+
+        Args:
+            max_uses_per_chunk (int): The number of contexts a chunk can be used in before it is saturated. Usage is
+                only tracked if None (default: 3).
+            path (str): The JSON file to load usage from and save usage to. When not provided, generate_dataset keeps
+                the usage next to the dataset instead (default: None).
+        """
+        if max_uses_per_chunk is not None and max_uses_per_chunk < 1:
+            raise ValueError(f"max_uses_per_chunk must be at least 1, got {max_uses_per_chunk}.")
+        self.max_uses_per_chunk = max_uses_per_chunk
+        self.path = path
+        self.counts: Dict[str, int] = {}
+        self.saturated: Set[str] = set()
+        self.excluded = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def uses(self, chunk_id: str) -> int:
+        """Get the number of contexts a chunk has been used in.
+
+        Args:
+            chunk_id (str): The id of the chunk.
+
+        Returns:
+            int: The number of uses recorded for the chunk.
+        """
+        return self.counts.get(chunk_id, 0)
+
+    def is_saturated(self, chunk_id: str) -> bool:
+        """Check whether a chunk has reached its cap and should not be used again.
+
+        Args:
+            chunk_id (str): The id of the chunk.
+
+        Returns:
+            bool: True if the chunk has been used max_uses_per_chunk times.
+        """
+        return chunk_id in self.saturated
+
+    def record(self, chunk_ids: Iterable[str]) -> None:
+        """Record one use of every chunk, for eg. every chunk of a context that was kept.
+
+        Args:
+            chunk_ids (Iterable[str]): The ids of the chunks used.
+        """
+        for chunk_id in chunk_ids:
+            uses = self.counts.get(chunk_id, 0) + 1
+            self.counts[chunk_id] = uses
+            if self.max_uses_per_chunk is not None and uses >= self.max_uses_per_chunk:
+                self.saturated.add(chunk_id)
+
+    def exclude_saturated(self, documents: List[Any]) -> List[Any]:
+        """Leave saturated chunks out of retrieval results.
+
+        Args:
+            documents (List[Document]): The documents retrieved, in the form of Haystack Documents.
+
+        Returns:
+            List[Document]: The documents that are not saturated, in their original order.
+        """
+        kept = [document for document in documents if document.id not in self.saturated]
+        self.excluded += len(documents) - len(kept)
+        return kept
+
+    def reset_stats(self) -> None:
+        """Reset the count of chunks excluded, for eg. at the start of a new run."""
+        self.excluded = 0
+
+    def report(self) -> str:
+        """Summarise the usage of chunks across contexts.
+
+        Returns:
+            str: A one-line report of chunks used, saturated and excluded since the counts were last reset.
+        """
+        most_used = max(self.counts.values(), default=0)
+        return (
+            f"Chunk usage: {len(self.counts)} chunks used, {len(self.saturated)} saturated at "
+            f"{self.max_uses_per_chunk} uses, most used chunk in {most_used} contexts, "
+            f"{self.excluded} saturated chunks excluded."
+        )
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Replace the usage in the index with usage saved as a JSON file.
+
+        Args:
+            path (str): The file path to load from. Defaults to the path the index was initialised with.
+        """
+        path = path or self.path
+        with open(path, 'r') as f:
+            self.restore(json.load(f))
+
+    def restore(self, counts: Dict[str, int]) -> None:
+        """Replace the usage in the index, e.g. with a snapshot of its counts taken before a run that failed.
+
+        Args:
+            counts (Dict[str, int]): The number of times each chunk ID was used.
+        """
+        self.counts = dict(counts)
+        self.saturated = set()
+        if self.max_uses_per_chunk is not None:
+            self.saturated = {
+                chunk_id for chunk_id, uses in self.counts.items() if uses >= self.max_uses_per_chunk
+            }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the usage as a JSON file.
+
+        Args:
+            path (str): The file path to save to. Defaults to the path the index was initialised with.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path provided to save chunk usage to.")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            json.dump(self.counts, f)
+
+##############################################
+# Quantised Embedding Cache - EmbeddingCache #
+##############################################
+
+class EmbeddingCache:
+    """Local cache of chunk embeddings, stored compressed so that the embeddings of a whole collection fit in memory on
+    one worker. Embeddings are normalised and stored either as float16, or as int8 with a scale for every vector, which
+    takes about a quarter of the memory of float32. Cosine similarities are computed directly on the stored form, as the
+    scales cancel out. The cache can be saved to and loaded from a .npz file between runs.
+    """
+
+    def __init__(self, dtype: str = "int8", path: Optional[str] = None, initial_capacity: int = 1024) -> None:
+        """Initialises the EmbeddingCache class. A cache already saved at path is loaded.
+
+        Args:
+            dtype (str): The type embeddings are stored as, "int8" or "float16" (default: "int8").
+            path (str): The .npz file to load the cache from and save the cache to. The cache is only kept in memory if
+                not provided (default: None).
+            initial_capacity (int): The number of embeddings space is reserved for, doubled whenever it runs out
+                (default: 1024).
+        """
+        if dtype not in ("int8", "float16"):
+            raise ValueError("dtype must be 'int8' or 'float16'.")
+        self.dtype = dtype
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self.rows: Dict[str, int] = {}
+        self.codes: Optional[np.ndarray] = None
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            saved = np.load(path, allow_pickle=False)
+            if str(saved["dtype"]) != dtype:
+                raise ValueError(f"The cache at {path} stores {saved['dtype']} embeddings, not {dtype}.")
+            self.codes = saved["codes"] if len(saved["ids"]) else None
+            self.scales = saved["scales"]
+            self.rows = {chunk_id: row for row, chunk_id in enumerate(saved["ids"].tolist())}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self.rows
+
+    @property
+    def nbytes(self) -> int:
+        """int: The memory taken by the stored embeddings and scales, in bytes."""
+        if self.codes is None:
+            return 0
+        return len(self.rows) * (self.codes.shape[1] * self.codes.itemsize + self.scales.itemsize)
+
+    def quantise(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Normalise embeddings and convert them to the stored form.
+
+        Args:
+            embeddings (np.ndarray): Matrix with an embedding as every row.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The stored form of every embedding, and the scale that converts it back.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        if self.dtype == "float16":
+            return embeddings.astype(np.float16), np.ones(len(embeddings), dtype=np.float32)
+        scales = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / 127
+        return np.round(embeddings / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def add(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Add embeddings to the cache. Ids already in the cache are skipped.
+
+        Args:
+            ids (List[str]): The chunk id of every embedding.
+            embeddings (np.ndarray): Matrix with the embedding of every chunk as a row.
+        """
+        new, seen = [], set()
+        for position, chunk_id in enumerate(ids):
+            if chunk_id not in self.rows and chunk_id not in seen:
+                seen.add(chunk_id)
+                new.append(position)
+        if not new:
+            return
+        codes, scales = self.quantise(np.asarray(embeddings, dtype=np.float32)[new])
+        start = len(self.rows)
+        if self.codes is None:
+            self.codes = np.zeros((max(self.initial_capacity, len(new)), codes.shape[1]), dtype=codes.dtype)
+            self.scales = np.zeros(len(self.codes), dtype=np.float32)
+        if start + len(new) > len(self.codes):
+            capacity = max(2 * len(self.codes), start + len(new))
+            self.codes = np.concatenate([self.codes, np.zeros((capacity - len(self.codes), codes.shape[1]), codes.dtype)])
+            self.scales = np.concatenate([self.scales, np.zeros(capacity - len(self.scales), dtype=np.float32)])
+        self.codes[start:start + len(new)] = codes
+        self.scales[start:start + len(new)] = scales
+        for offset, position in enumerate(new):
+            self.rows[ids[position]] = start + offset
+
+    def lookup(self, ids: List[str]) -> np.ndarray:
+        """Find the row of every id in the cache. Every id found counts as a hit and every id missing counts as a miss.
+
+        Args:
+            ids (List[str]): The chunk ids to look up.
+
+        Returns:
+            np.ndarray: The row of every id, or -1 for ids that are not cached.
+        """
+        rows = np.fromiter((self.rows.get(chunk_id, -1) for chunk_id in ids), dtype=np.int64, count=len(ids))
+        self.misses += int((rows < 0).sum())
+        self.hits += len(ids) - int((rows < 0).sum())
+        return rows
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """Get the embeddings of chunks in the cache, converted back to float32.
+
+        Args:
+            ids (List[str]): The chunk ids to get the embeddings of.
+
+        Returns:
+            np.ndarray: Matrix with the normalised embedding of every chunk as a row.
+        """
+        rows = [self.rows[chunk_id] for chunk_id in ids]
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None]
+
+    def similarities(self, left_ids: List[str], right_ids: List[str]) -> np.ndarray:
+        """Cosine similarity between pairs of cached chunks, computed on the stored form.
+
+        Args:
+            left_ids (List[str]): The chunk ids on the left of every pair.
+            right_ids (List[str]): The chunk ids on the right of every pair.
+
+        Returns:
+            np.ndarray: The similarity of every pair.
+        """
+        accumulator = np.int32 if self.dtype == "int8" else np.float32
+        left = self.codes[[self.rows[chunk_id] for chunk_id in left_ids]].astype(accumulator)
+        right = self.codes[[self.rows[chunk_id] for chunk_id in right_ids]].astype(accumulator)
+        # The scales of the two vectors cancel out of the cosine, so only the norms of the stored forms are needed
+        norms = np.sqrt(
+            np.einsum('ij,ij->i', left, left).astype(np.float64) * np.einsum('ij,ij->i', right, right).astype(np.float64)
+        )
+        return np.einsum('ij,ij->i', left, right).astype(np.float64) / np.maximum(norms, 1e-12)
+
+    def reset_stats(self) -> None:
+        """Reset the hit and miss counters, for eg. at the start of a new run."""
+        self.hits = 0
+        self.misses = 0
+
+    def report(self) -> str:
+        """Summarise the cache size, and the hits and misses since the counters were last reset.
+
+        Returns:
+            str: A one-line report of entries, memory, hits, misses and hit rate.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"Embedding cache: {len(self)} {self.dtype} embeddings ({self.nbytes / (1024 * 1024):.1f} MB), "
+            f"{self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate)"
+        )
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the cache as a .npz file.
+
+        Args:
+            path (str): The file path to save to. Defaults to the path the cache was initialised with.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path provided to save the embedding cache to.")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        size = len(self.rows)
+        ids = np.asarray(sorted(self.rows, key=self.rows.get), dtype=str)
+        codes = self.codes[:size] if self.codes is not None else np.zeros((0, 0), dtype=self.dtype)
+        with open(path, 'wb') as f:
+            np.savez(f, dtype=np.asarray(self.dtype), ids=ids, codes=codes, scales=self.scales[:size])
@@ -4,26 +4,37 @@
 
 # Generic/Built-in
 import json
+import math
 import os
 import random
 import uuid
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple, Dict
+from collections import Counter
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple, Dict
 from tqdm import tqdm
 
 # Libs
+import numpy as np
 from haystack.components.generators import AzureOpenAIGenerator
 from llama_index.finetuning import EmbeddingQAFinetuneDataset
 from milvus_haystack import MilvusDocumentStore
+from milvus_haystack.filters import parse_filters
 from pandas import DataFrame
-from scipy.spatial.distance import cosine
 
 # Custom
+from .caching import ChunkUsageIndex, ChunkVerdictStore, ResponseCache, SourceCatalog
+from .dedup import ChunkDeduplicator, QueryDeduplicator
+from .execution import AsyncModelExecutor, RateLimiter
+from .journal import CheckpointJournal
+from .knn_graph import KNNGraph
+from .metrics import RunMetrics
+from .prefilter import ChunkPreFilter
 from .utils import (
     format_answer_query_template,
     format_chunk_query_template,
     format_context_query_template,
     format_evaluate_chunk_template,
+    format_evaluate_chunks_batch_template,
     format_separating_multi_query_template,
     reasoning_evolution,
     generalizing_evolution,
@@ -71,6 +82,19 @@ class DocumentStoreWrapper(ABC):
             List[str]: List of sources.
         """
         raise NotImplementedError
+
+    def get_source_counts(self) -> Dict[str, int]:
+        """Get the number of chunks in every source. This is used to weight sources by their size, for eg. in
+        train_val_test_split. By default, the chunks of every source are counted by paging through them, so override
+        this method if the document store can count them cheaply.
+
+        Returns:
+            Dict[str, int]: Mapping of source to its number of chunks.
+        """
+        return {
+            source: sum(len(page) for page in self.iter_chunks_from_sources([source]))
+            for source in self.get_all_sources()
+        }
     
     @abstractmethod
     def get_chunks_from_sources(
@@ -87,6 +111,26 @@ class DocumentStoreWrapper(ABC):
             List[Tuple[str, str]]: List of chunks. Each chunk is a tuple in the form of (id, chunk).
         """
         raise NotImplementedError
+
+    def iter_chunks_from_sources(
+            self,
+            sources: List[str],
+            batch_size: int = 1000
+        ) -> Iterator[List[Tuple[str, str]]]:
+        """Iterate over the chunks from the sources provided, one page at a time, so that huge collections can be
+        consumed without holding every chunk in memory. By default, the chunks are fetched with get_chunks_from_sources
+        and split into pages, so override this method if the document store can page through results.
+
+        Args:
+            sources (List[str]): List of sources to get chunks from.
+            batch_size (int): The number of chunks in each page (default: 1000).
+
+        Yields:
+            List[Tuple[str, str]]: A page of chunks. Each chunk is a tuple in the form of (id, chunk).
+        """
+        chunks = self.get_chunks_from_sources(sources)
+        for start in range(0, len(chunks), batch_size):
+            yield chunks[start:start + batch_size]
     
     @abstractmethod
     def get_chunk_embedding(self, chunk: Tuple[str, str]) -> List[float]:
@@ -99,6 +143,19 @@ class DocumentStoreWrapper(ABC):
             List[float]: The embedding of the chunk.
         """
         raise NotImplementedError
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]]) -> List[List[float]]:
+        """Get the embeddings of many chunks at once. This method is run in get_n_contexts method to fetch the embeddings
+        of seed chunks in bulk. By default, get_chunk_embedding is called for every chunk, so override this method if
+        the document store can fetch many embeddings in a single request.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to get the embeddings of, in the form of (id, chunk).
+
+        Returns:
+            List[List[float]]: The embedding of every chunk, in the same order as the chunks.
+        """
+        return [self.get_chunk_embedding(chunk) for chunk in chunks]
     
     @abstractmethod
     def retrieve_similar_chunks(
@@ -119,6 +176,58 @@ class DocumentStoreWrapper(ABC):
             List[str]: List of n similar chunks.
         """
         raise NotImplementedError
+
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]]
+        ) -> List[List[Any]]:
+        """Retrieve the top_k similar chunks for many embeddings at once. This method is run in get_n_contexts method to 
+        retrieve the neighbours of many seed chunks together. By default, retrieve_similar_chunks is called for every 
+        embedding, so override this method if the document store can search with many query vectors in a single request.
+
+        Args:
+            chunk_embeddings (List[List[float]]): The embeddings to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve for each embedding.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+
+        Returns:
+            List[List[Any]]: The similar chunks of every embedding, in the same order as the embeddings.
+        """
+        return [
+            self.retrieve_similar_chunks(chunk_embedding=chunk_embedding, top_k=top_k, sources=sources)
+            for chunk_embedding in chunk_embeddings
+        ]
+
+    def neighbour_similarities(
+            self,
+            seeds: List[Tuple[str, str]],
+            seed_embeddings: List[List[float]],
+            neighbours: List[List[Any]],
+        ) -> np.ndarray:
+        """Compute the cosine similarity of every neighbour to its seed at once. This method is run in get_n_contexts
+        method to check neighbours against the similarity threshold. By default, similarities are computed from the
+        embeddings of the seeds and of the neighbours returned by retrieve_similar_chunks_batch, so override this method
+        if the document store holds the embeddings in another form.
+
+        Args:
+            seeds (List[Tuple[str, str]]): The seed chunks, in the form of (id, chunk).
+            seed_embeddings (List[List[float]]): The embedding of every seed.
+            neighbours (List[List[Any]]): The similar chunks of every seed.
+
+        Returns:
+            np.ndarray: The similarity of every neighbour to its seed, in the order of the seeds and their neighbours.
+        """
+        counts = [len(similar_chunks) for similar_chunks in neighbours]
+        if sum(counts) == 0:
+            return np.zeros(0)
+        seed_matrix = np.repeat(np.asarray(seed_embeddings, dtype=np.float64), counts, axis=0)
+        neighbour_matrix = np.asarray(
+            [chunk.embedding for similar_chunks in neighbours for chunk in similar_chunks], dtype=np.float64
+        )
+        norms = np.linalg.norm(seed_matrix, axis=1) * np.linalg.norm(neighbour_matrix, axis=1)
+        return np.einsum('ij,ij->i', seed_matrix, neighbour_matrix) / np.maximum(norms, 1e-12)
     
 ###################################################
 # Milvus Integration - MilvusDocumentStoreWrapper #
@@ -129,23 +238,59 @@ class MilvusDocumentStoreWrapper(DocumentStoreWrapper):
     with the Milvus database. 
     """
 
-    def __init__(self, document_store: MilvusDocumentStore) -> None:
+    def __init__(
+            self, 
+            document_store: MilvusDocumentStore,
+            source_catalog: Optional[SourceCatalog] = None,
+        ) -> None:
+        """Initialises the MilvusDocumentStoreWrapper class.
+
+        Args:
+            document_store (MilvusDocumentStore): The document store to wrap.
+            source_catalog (SourceCatalog): Catalog of sources and their chunk counts, reused until the row count of the
+                collection changes. Provide a catalog with a path to keep it between runs. An in-memory catalog is used
+                if not provided (default: None).
+        """
         self.document_store = document_store
+        self.source_catalog = source_catalog if source_catalog is not None else SourceCatalog()
     
     def get_all_sources(self) -> List[str]:
         """Get all document sources from Milvus document store. Document sources refer to file paths, and are used to filter
         chunks by their original documents. This allows for the generation of questions from specific sources, and is 
-        necessary to run train_val_test_split and get_all_chunks methods.
+        necessary to run train_val_test_split and get_all_chunks methods. Sources are read from the source catalog, 
+        which is only rebuilt when the collection has changed.
 
         Returns:
-            List[str]: List of sources.
+            List[str]: List of sources, in sorted order.
         """
-        sources = [doc["source"] for doc in self.document_store.col.query(
-            expr="id != ''", 
-            output_fields=["source"]
-            )
-        ]
-        return list(set(sources))
+        return sorted(self.get_source_counts())
+
+    def get_source_counts(self, batch_size: int = 10000) -> Dict[str, int]:
+        """Get the number of chunks in every source from the source catalog. If the catalog was built for a different 
+        version of the collection, the collection is scanned page by page to rebuild it.
+
+        Args:
+            batch_size (int): The number of rows read in each page when rebuilding the catalog (default: 10000).
+
+        Returns:
+            Dict[str, int]: Mapping of source to its number of chunks.
+        """
+        col = self.document_store.col
+        # The row count changes whenever chunks are added or deleted, which is what invalidates the catalog
+        version = f"{col.name}:{col.num_entities}"
+        if not self.source_catalog.is_current(version):
+            counts = Counter()
+            iterator = col.query_iterator(batch_size=batch_size, expr="id != ''", output_fields=["source"])
+            try:
+                while True:
+                    page = iterator.next()
+                    if not page:
+                        break
+                    counts.update(doc["source"] for doc in page)
+            finally:
+                iterator.close()
+            self.source_catalog.update(counts, version)
+        return dict(self.source_catalog.counts)
     
     def get_chunks_from_sources(
             self, 
@@ -160,13 +305,37 @@ class MilvusDocumentStoreWrapper(DocumentStoreWrapper):
         Returns:
             List[Tuple[str, str]]: List of chunks. Each chunk is a tuple in the form of (id, chunk).
         """
-        chunks = [(doc["id"], doc["text"]) 
-                  for doc in self.document_store.col.query(
-                      expr=f"source in {sources}", 
-                      output_fields=["text"]
-                    )
-                ]
+        chunks = [chunk for page in self.iter_chunks_from_sources(sources) for chunk in page]
         return chunks
+
+    def iter_chunks_from_sources(
+            self,
+            sources: List[str],
+            batch_size: int = 1000
+        ) -> Iterator[List[Tuple[str, str]]]:
+        """Iterate over the chunks from the sources provided, one page at a time, using a Milvus query iterator. Unlike
+        a single query, this is not bound by the query result limit of Milvus, and only one page is held in memory.
+
+        Args:
+            sources (List[str]): List of sources to get chunks from.
+            batch_size (int): The number of chunks in each page (default: 1000).
+
+        Yields:
+            List[Tuple[str, str]]: A page of chunks. Each chunk is a tuple in the form of (id, chunk).
+        """
+        iterator = self.document_store.col.query_iterator(
+            batch_size=batch_size,
+            expr=f"source in {sources}",
+            output_fields=["text"]
+        )
+        try:
+            while True:
+                page = iterator.next()
+                if not page:
+                    break
+                yield [(doc["id"], doc["text"]) for doc in page]
+        finally:
+            iterator.close()
     
     def get_chunk_embedding(self, chunk: str) -> List[float]:
         """Get the embedding of a chunk. The embedding is used to retrieve similar chunks.
@@ -181,6 +350,30 @@ class MilvusDocumentStoreWrapper(DocumentStoreWrapper):
             expr=f"id == '{chunk[0]}'", 
             output_fields=["vector"]
             )[0]['vector']
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]], batch_size: int = 500) -> List[List[float]]:
+        """Get the embeddings of many chunks at once, with one query per batch of ids instead of one query per chunk.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to get the embeddings of, in the form of (id, chunk).
+            batch_size (int): The number of ids looked up in each query (default: 500).
+
+        Returns:
+            List[List[float]]: The embedding of every chunk, in the same order as the chunks.
+        """
+        ids = list(dict.fromkeys(chunk[0] for chunk in chunks))
+        embeddings = {}
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            for doc in self.document_store.col.query(
+                expr=f"id in {batch}", 
+                output_fields=["vector"]
+                ):
+                embeddings[doc["id"]] = doc["vector"]
+        missing = [chunk[0] for chunk in chunks if chunk[0] not in embeddings]
+        if missing:
+            raise KeyError(f"No embedding found for {len(missing)} chunks, for eg. '{missing[0]}'.")
+        return [embeddings[chunk[0]] for chunk in chunks]
     
     def retrieve_similar_chunks(
             self, 
@@ -213,6 +406,52 @@ class MilvusDocumentStoreWrapper(DocumentStoreWrapper):
             top_k=top_k
         )
 
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]],
+            batch_size: int = 64,
+        ) -> List[List[Any]]:
+        """Retrieve the top_k similar chunks for many embeddings at once, with one search per batch of embeddings 
+        instead of one search per embedding. Chunks are returned with their scores and embeddings, in the same form as
+        retrieve_similar_chunks.
+
+        Args:
+            chunk_embeddings (List[List[float]]): The embeddings to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve for each embedding.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+            batch_size (int): The number of embeddings sent in each search (default: 64).
+
+        Returns:
+            List[List[Document]]: The similar chunks of every embedding, in the same order as the embeddings.
+        """
+        document_store = self.document_store
+        if document_store.col is None:
+            return [[] for _ in chunk_embeddings]
+        # Batched search builds on internals of MilvusDocumentStore, which requirements.txt pins to a tested version
+        # range. Fall back to one search per embedding if a different version no longer has them
+        if not all(hasattr(document_store, attribute) for attribute in (
+            "_select_score_fn", "_vector_field", "_get_output_fields", "_parse_search_result"
+        )):
+            return [self.retrieve_similar_chunks(embedding, top_k, sources) for embedding in chunk_embeddings]
+        expr = parse_filters({"field": "source", "operator": "in", "value": sources}) if sources else None
+        distance_to_score_fn = document_store._select_score_fn()
+        results = []
+        for start in range(0, len(chunk_embeddings), batch_size):
+            res = document_store.col.search(
+                data=chunk_embeddings[start:start + batch_size],
+                anns_field=document_store._vector_field,
+                param=document_store.search_params,
+                limit=top_k,
+                expr=expr,
+                output_fields=document_store._get_output_fields(),
+                timeout=None,
+            )
+            for hits in res:
+                results.append(document_store._parse_search_result([hits], distance_to_score_fn=distance_to_score_fn))
+        return results
+
 ########################################
 # Dataset Generator - DatasetGenerator #
 ########################################
@@ -227,7 +466,19 @@ class DatasetGenerator:
             self, 
             document_store_wrapper: DocumentStoreWrapper, 
             model: AzureOpenAIGenerator, 
-            seed: int = 42
+            seed: int = 42,
+            max_concurrency: int = 8,
+            response_cache: Optional[ResponseCache] = None,
+            verdict_store: Optional[ChunkVerdictStore] = None,
+            evaluation_batch_size: int = 1,
+            rate_limiter: Optional[RateLimiter] = None,
+            max_retries: int = 5,
+            prefilter: Optional[ChunkPreFilter] = None,
+            metrics: Optional[RunMetrics] = None,
+            speculative_sampling: bool = False,
+            deduplicator: Optional[ChunkDeduplicator] = None,
+            query_deduplicator: Optional[QueryDeduplicator] = None,
+            usage_index: Optional[ChunkUsageIndex] = None,
         ) -> None:
         """Initialises the DatasetGenerator class.
 
@@ -238,14 +489,77 @@ class DatasetGenerator:
                 is compatible with the Haystack library can be used. Haystack library can be found at 
                 https://docs.haystack.deepset.ai/docs/generators.
             seed (int): The random seed to be used for reproducibility (default: 42).
+            max_concurrency (int): The maximum number of prompts sent to the language model at the same time. Results are
+                always collected in prompt order, so the dataset generated for a given seed does not depend on this value
+                (default: 8).
+            response_cache (ResponseCache): On-disk cache of model replies shared across runs. When provided, reruns only
+                pay for prompts that have not been seen before, and a hit/miss report is printed at the end of each
+                generate_dataset run (default: None).
+            verdict_store (ChunkVerdictStore): Index of chunk evaluation verdicts that is checked before any chunk is
+                sent to the language model for evaluation. Provide a store with a path to keep verdicts between runs.
+                An in-memory store is used if not provided (default: None).
+            evaluation_batch_size (int): The number of chunks judged in a single evaluation prompt. Values above 1 send
+                the instructions once for every batch of chunks instead of once per chunk (default: 1).
+            rate_limiter (RateLimiter): Keeps requests within the deployment's requests-per-minute and tokens-per-minute
+                quota. When provided, the time each stage spent waiting on quota is printed at the end of each 
+                generate_dataset run (default: None).
+            max_retries (int): The number of times a request throttled by the deployment is retried, with exponential
+                backoff and jitter, before generation fails (default: 5).
+            prefilter (ChunkPreFilter): Cheap local filter that rejects chunks which are clearly metadata before they are
+                sent to the language model for evaluation. When provided, the number of chunks rejected by each rule is
+                printed at the end of each generate_dataset run (default: None).
+            metrics (RunMetrics): Records the stage, tokens, latency and retries of every call to the language model.
+                A report is printed at the end of each generate_dataset run, and saved next to the dataset as
+                <name>_metrics.json. Pass a RunMetrics with token prices to estimate cost (default: RunMetrics()).
+            speculative_sampling (bool): Whether get_n_random_chunks evaluates more candidates at once than it still
+                needs, sized from the acceptance rate observed so far. This takes fewer rounds of LLM calls at the cost
+                of some extra evaluations, and accepts the same chunks as evaluating them one at a time. get_n_contexts
+                likewise draws more seeds at once, sized from the share of seeds that formed a context so far
+                (default: False).
+            deduplicator (ChunkDeduplicator): Local near-duplicate detection run on the chunks given to generate_dataset
+                before any of them is sent to the language model. Near-duplicates of chunks already in a context are
+                also kept out of it. When provided, the number of chunks removed is printed at the end of each
+                generate_dataset run (default: None).
+            query_deduplicator (QueryDeduplicator): Drops near-duplicate queries once they are generated and evolved,
+                before they are answered. When provided, the number of queries dropped is printed at the end of each
+                generate_dataset run (default: None).
+            usage_index (ChunkUsageIndex): Counts the contexts every chunk is used in. Chunks used as often as its cap
+                allows are left out of retrieval results and skipped as seeds. Unless the index has a path of its own, it
+                is saved next to the dataset as <name>_usage.json and loaded from there by later runs (default: None).
         """
+        if evaluation_batch_size < 1:
+            raise ValueError(f"evaluation_batch_size must be at least 1, got {evaluation_batch_size}.")
         self.document_store_wrapper = document_store_wrapper
         self.model = model
         self.seed = seed
+        self.response_cache = response_cache
+        self.verdict_store = verdict_store if verdict_store is not None else ChunkVerdictStore()
+        self.evaluation_batch_size = evaluation_batch_size
+        self.rate_limiter = rate_limiter
+        self.prefilter = prefilter
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.speculative_sampling = speculative_sampling
+        self.deduplicator = deduplicator
+        self.query_deduplicator = query_deduplicator
+        self.usage_index = usage_index
+        # Set by generate_dataset for the length of a run, so that every stage checkpoints its items
+        self.journal: Optional[CheckpointJournal] = None
+        # Verdict keys of the chunks the pre-filter rejected during the current run. Rejections are not written to the
+        # verdict store, which outlives the pre-filter rules that produced them
+        self.prefilter_rejections: Set[str] = set()
+        self.executor = AsyncModelExecutor(
+            model,
+            max_concurrency=max_concurrency,
+            response_cache=response_cache,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            metrics=self.metrics,
+        )
 
     def train_val_test_split(
             self,
             split_ratio: List = [0.6, 0.2, 0.2], 
+            weight_by_size: bool = False,
         ) -> tuple[List[str], List[str], List[str]]:
         """
         Splits a collection of documents into training and validation sets based on a given ratio.
@@ -253,6 +567,8 @@ class DatasetGenerator:
         Args:
             collection (list): A collection of documents to be split.
             split_ratio (float): The ratio of documents to be included in the training set (default: 0.8).
+            weight_by_size (bool): Whether to split by the number of chunks in each source instead of the number of
+                sources, so that each split gets its share of chunks even when sources differ in size (default: False).
 
         Returns:
             tuple: A tuple containing the training and validation sets of documents.
@@ -262,6 +578,12 @@ class DatasetGenerator:
         random.shuffle(sources)
         train_split_index = int(len(sources) * split_ratio[0])
         val_split_index = int(len(sources) * (split_ratio[0] + split_ratio[1]))
+        if weight_by_size:
+            counts = self.document_store_wrapper.get_source_counts()
+            cumulative = np.cumsum([counts.get(source, 0) for source in sources])
+            total = cumulative[-1] if len(cumulative) else 0
+            train_split_index = int(np.searchsorted(cumulative, total * split_ratio[0], side='right'))
+            val_split_index = int(np.searchsorted(cumulative, total * (split_ratio[0] + split_ratio[1]), side='right'))
         train_sources = sources[:train_split_index]
         val_sources = sources[train_split_index:val_split_index]
         test_sources = sources[val_split_index:]
@@ -280,6 +602,65 @@ class DatasetGenerator:
         chunks = self.document_store_wrapper.get_chunks_from_sources(sources)
         return chunks
 
+    def iter_chunks(
+            self,
+            sources: Optional[List[str]] = None,
+            batch_size: int = 1000,
+        ) -> Iterator[List[Tuple[str, str]]]:
+        """Iterate over chunks from the document store one page at a time, without loading every chunk into memory.
+        Pass the pages to sample_chunks to draw chunks for generation from a huge collection.
+
+        Args:
+            sources (List[str]): List of sources to get chunks from. Chunks from every source are returned if not
+                provided (default: None).
+            batch_size (int): The number of chunks in each page (default: 1000).
+
+        Yields:
+            List[Tuple[str, str]]: A page of chunks with format (id, chunk).
+        """
+        if sources is None:
+            sources = self.document_store_wrapper.get_all_sources()
+        yield from self.document_store_wrapper.iter_chunks_from_sources(sources, batch_size=batch_size)
+
+    def sample_chunks(
+            self,
+            pages: Iterable[List[Tuple[str, str]]],
+            k: int,
+            chunk_size_threshold: Optional[int] = 200,
+        ) -> List[Tuple[str, str]]:
+        """Draw a uniform random sample of k chunks from pages of chunks, for eg. from iter_chunks, keeping at most k
+        chunks in memory at any time. Chunks at or under chunk_size_threshold, and chunks rejected by the pre-filter if
+        one is set, are skipped, so that the sample only holds chunks that could be used for generation. The sample can
+        be passed to generate_dataset as its chunks. The sample is reproducible for a given seed and page order.
+
+        Args:
+            pages (Iterable[List[Tuple[str, str]]]): Pages of chunks in format (id, chunk).
+            k (int): The number of chunks to sample. Use a multiple of the number of questions, as not every chunk
+                passes evaluation.
+            chunk_size_threshold (int): The threshold for the size of the chunks to be considered for generating
+                questions.
+
+        Returns:
+            List[Tuple[str, str]]: The sampled chunks, or every usable chunk if there are fewer than k.
+        """
+        rng = random.Random(self.seed)
+        reservoir = []
+        seen = 0
+        for page in pages:
+            page = [chunk for chunk in page if len(chunk[1]) > chunk_size_threshold]
+            if self.prefilter is not None and page:
+                page = [chunk for chunk, keep in zip(page, self.prefilter.filter([c[1] for c in page])) if keep]
+            for chunk in page:
+                seen += 1
+                # Reservoir sampling keeps every chunk seen so far in the sample with equal probability
+                if len(reservoir) < k:
+                    reservoir.append(chunk)
+                else:
+                    slot = rng.randrange(seen)
+                    if slot < k:
+                        reservoir[slot] = chunk
+        return reservoir
+
     def generate_dataset(
             self,
             number_of_questions: int,
@@ -294,6 +675,8 @@ class DatasetGenerator:
             max_chunks_per_context: int = 5,
             min_chunks_per_context: int = 2,
             similarity_threshold: Optional[float] = 0.5,
+            knn_graph: Optional[KNNGraph] = None,
+            resume: bool = False,
     ):
         """Generate a dataset of questions from a list of chunks. The dataset will consist of questions, contexts (chunks
         in Milvus database that the questions are generated from), and the expected answers to the questions. The dataset
@@ -314,36 +697,105 @@ class DatasetGenerator:
             min_chunks_per_context (int): The minimum number of chunks to concatenate together to form a context.
             similarity_threshold (float): The similarity threshold to be used for filtering similar chunks. Value should be
                 between 0 and 1.
+            knn_graph (KNNGraph): Precomputed graph of similar chunks to build multi-chunk contexts from (default: None).
+            resume (bool): Whether to resume an interrupted run with the same json_path. Every stage records each item
+                in <name>_journal.jsonl next to the dataset as soon as it is done, and a resumed run reuses them instead
+                of generating them again. The journal is started afresh if False (default: False).
 
         Returns:
             myDataset: A dataset of question-context pairs.
         """
+        if resume and not json_path:
+            raise ValueError("resume requires a json_path to find the journal of the interrupted run.")
         basename = 'data'
         if not os.path.exists(basename):
             os.mkdir(basename)
+        metrics_path = os.path.join(basename, os.path.splitext(json_path)[0] + '_metrics.json') if json_path else None
+        usage_path = os.path.join(basename, os.path.splitext(json_path)[0] + '_usage.json') if json_path else None
+        journal_path = os.path.join(basename, os.path.splitext(json_path)[0] + '_journal.jsonl') if json_path else None
         json_path = os.path.join(basename, json_path)
-        if get_multi_context:
-            dataset = self.generate_multi_context_queries(
-                n = number_of_questions,
-                chunks = chunks,
-                sources = sources, 
-                json_path = json_path,
-                chunk_size_threshold = chunk_size_threshold,
-                max_chunks_per_context = max_chunks_per_context,
-                min_chunks_per_context = min_chunks_per_context,
-                similarity_threshold = similarity_threshold,
-            )
-        else:
-            dataset = self.generate_n_single_chunk_queries(
-                n = number_of_questions,
-                chunks = chunks,
-                json_path = json_path,
-                chunk_size_threshold = chunk_size_threshold,
-            )
-        if evolve_queries:
-            dataset = self.evolve_questions(dataset, json_path, evolve_steps)
-        if generate_answers:
-            dataset = self.answer_query(dataset, json_path)
+        self.metrics.reset()
+        if self.response_cache is not None:
+            self.response_cache.reset_stats()
+        if self.rate_limiter is not None:
+            self.rate_limiter.reset_stats()
+        if self.prefilter is not None:
+            self.prefilter.reset_stats()
+        self.prefilter_rejections = set()
+        if self.deduplicator is not None:
+            self.deduplicator.reset_stats()
+            chunks = self.deduplicator.deduplicate(chunks)
+        if self.query_deduplicator is not None:
+            self.query_deduplicator.reset_stats()
+        if self.usage_index is not None:
+            self.usage_index.reset_stats()
+            usage_path = self.usage_index.path or usage_path
+            if not self.usage_index.path and usage_path and os.path.exists(usage_path):
+                self.usage_index.load(usage_path)
+            # Usage recorded by a run that fails is rolled back, so that resuming it does not count its selections twice
+            usage_snapshot = dict(self.usage_index.counts)
+        if journal_path:
+            self.journal = CheckpointJournal(journal_path, resume=resume)
+        try:
+            if get_multi_context:
+                dataset = self.generate_multi_context_queries(
+                    n = number_of_questions,
+                    chunks = chunks,
+                    sources = sources, 
+                    json_path = json_path,
+                    chunk_size_threshold = chunk_size_threshold,
+                    max_chunks_per_context = max_chunks_per_context,
+                    min_chunks_per_context = min_chunks_per_context,
+                    similarity_threshold = similarity_threshold,
+                    knn_graph = knn_graph,
+                )
+            else:
+                dataset = self.generate_n_single_chunk_queries(
+                    n = number_of_questions,
+                    chunks = chunks,
+                    json_path = json_path,
+                    chunk_size_threshold = chunk_size_threshold,
+                )
+            if evolve_queries:
+                dataset = self.evolve_questions(dataset, json_path, evolve_steps)
+            if self.query_deduplicator is not None:
+                dataset = self.query_deduplicator.deduplicate(dataset)
+                # Export checkpoint data to json path
+                if json_path:
+                    dataset.save_json(json_path)
+            if generate_answers:
+                dataset = self.answer_query(dataset, json_path)
+            if self.usage_index is not None and usage_path:
+                self.usage_index.save(usage_path)
+                if self.journal is not None:
+                    # The saved usage now counts the chunks and contexts in the journal, so resumed runs do not
+                    # count them again
+                    self.journal.record("generate_dataset", "usage_saved", True)
+        except BaseException:
+            if self.usage_index is not None:
+                self.usage_index.restore(usage_snapshot)
+            raise
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+        if self.response_cache is not None:
+            print(self.response_cache.report())
+        if self.rate_limiter is not None:
+            print(self.rate_limiter.report())
+        if self.prefilter is not None:
+            print(self.prefilter.report())
+        if self.deduplicator is not None:
+            print(self.deduplicator.report())
+        if self.query_deduplicator is not None:
+            print(self.query_deduplicator.report())
+        if self.usage_index is not None:
+            print(self.usage_index.report())
+        print(self.metrics.report(accepted_questions=len(dataset.queries)))
+        if metrics_path:
+            self.metrics.save(metrics_path, accepted_questions=len(dataset.queries))
+        if self.verdict_store.path:
+            self.verdict_store.save()
         return dataset
 
     def evolve_questions(
@@ -408,24 +860,31 @@ class DatasetGenerator:
             "hypothetical_scenario_evolution": hypothetical_scenario_evolution
         }
 
+        for step in evolve_steps:
+            if step not in EVOLUTION_MAPPINGS:
+                raise NotImplementedError(f"Step '{step}' is not implemented.")
+
         # Temporary dictionaries to store new queries and relevant_docs
         new_queries = {}
         new_relevant_docs = {}
 
-        for doc_key, context_keys in tqdm(data.relevant_docs.items(), total=len(data.relevant_docs)):
-            # Get the original query and its context
+        # Build every evolution prompt up front so that they can be run concurrently
+        prompts = []
+        for doc_key, context_keys in data.relevant_docs.items():
             original_query = data.queries[doc_key]
             context_concat = ' '.join([data.corpus[context_key] for context_key in context_keys])
+            for step in evolve_steps:
+                prompts.append(EVOLUTION_MAPPINGS[step](original_query, context_concat))
+        evolved_queries = iter(self._run_journaled(prompts, stage="evolve_questions", desc="Evolving Queries"))
 
+        for doc_key, context_keys in data.relevant_docs.items():
             # Store the original query (no change to doc_key)
-            new_queries[doc_key] = original_query
+            new_queries[doc_key] = data.queries[doc_key]
             new_relevant_docs[doc_key] = context_keys
 
-            # Perform query evolutions
-            for step in evolve_steps:
-                if step not in EVOLUTION_MAPPINGS:
-                    raise NotImplementedError(f"Step '{step}' is not implemented.")
-                evolved_query = self.model.run(EVOLUTION_MAPPINGS[step](original_query, context_concat))['replies'][0]
+            # Collect query evolutions
+            for _ in evolve_steps:
+                evolved_query = next(evolved_queries)
                 evolved_query_uuid = str(uuid.uuid4())
 
                 # Add the evolved query with a new UUID
@@ -453,6 +912,7 @@ class DatasetGenerator:
             max_chunks_per_context: int = 5,
             min_chunks_per_context: int = 2,
             similarity_threshold: Optional[float] = 0.5,
+            knn_graph: Optional[KNNGraph] = None,
         ) -> myDataset:
         """Generate questions from a list of contexts.
 
@@ -466,19 +926,41 @@ class DatasetGenerator:
             min_chunks_per_context (int): The minimum number of chunks to concatenate together to form a context.
             similarity_threshold (float): The similarity threshold to be used for filtering similar chunks. Value should be
             between 0 and 1.
+            knn_graph (KNNGraph): Precomputed graph of similar chunks. When provided, contexts are built from the graph
+                with get_n_contexts_from_graph instead of retrieving the neighbours of every seed (default: None).
 
         Returns:
             myDataset: A dataset of question-context pairs.
         """
-        contexts = self.get_n_contexts(
-            n, 
-            chunks, 
-            sources, 
-            chunk_size_threshold=chunk_size_threshold,
-            max_chunks_per_context=max_chunks_per_context,
-            min_chunks_per_context=min_chunks_per_context,
-            similarity_threshold=similarity_threshold, 
-        )
+        selected = self.journal.get("generate_multi_context_queries", "contexts") if self.journal is not None else None
+        if selected is not None:
+            # Contexts built before the run was interrupted are reused, without evaluating or retrieving any chunk again
+            contexts = [[tuple(chunk) for chunk in context] for context in selected]
+            if self.usage_index is not None and not self.journal.get("generate_dataset", "usage_saved"):
+                for context in contexts:
+                    self.usage_index.record(chunk[0] for chunk in context)
+        elif knn_graph is not None:
+            contexts = self.get_n_contexts_from_graph(
+                n,
+                chunks,
+                knn_graph,
+                chunk_size_threshold=chunk_size_threshold,
+                max_chunks_per_context=max_chunks_per_context,
+                min_chunks_per_context=min_chunks_per_context,
+                similarity_threshold=similarity_threshold,
+            )
+        else:
+            contexts = self.get_n_contexts(
+                n, 
+                chunks, 
+                sources, 
+                chunk_size_threshold=chunk_size_threshold,
+                max_chunks_per_context=max_chunks_per_context,
+                min_chunks_per_context=min_chunks_per_context,
+                similarity_threshold=similarity_threshold, 
+            )
+        if selected is None and self.journal is not None:
+            self.journal.record("generate_multi_context_queries", "contexts", contexts)
         corpus = {}
         for context in contexts:
             for chunk in context:
@@ -486,9 +968,12 @@ class DatasetGenerator:
                     corpus[chunk[0]] = chunk[1]
         queries = {}
         relevant_docs = {}
-        for context in tqdm(contexts, desc="Generating Queries"):
-            prompt = format_context_query_template(context, len(context))
-            query = json.loads(self.model.run(prompt)['replies'][0])
+        prompts = [format_context_query_template(context, len(context)) for context in contexts]
+        replies = self._run_journaled(
+            prompts, stage="generate_multi_context_queries", desc="Generating Queries", parse=json.loads
+        )
+        for context, reply in zip(contexts, replies):
+            query = json.loads(reply)
             query_id = str(uuid.uuid4())
             queries[query_id] = query
             relevant_docs[query_id] = [chunk[0] for chunk in context]
@@ -523,14 +1008,27 @@ class DatasetGenerator:
         Returns:
             myDataset: A dataset of question-chunk pairs.
         """
-        chunks = [chunk for chunk in chunks if len(chunk[1]) > chunk_size_threshold]
-        random_chunks = self.get_n_random_chunks(chunks, n)
+        chunks = [
+            chunk for chunk in chunks if len(chunk[1]) > chunk_size_threshold and not self._is_saturated(chunk[0])
+        ]
+        selected = self.journal.get("generate_n_single_chunk_queries", "chunks") if self.journal is not None else None
+        if selected is None:
+            random_chunks = self.get_n_random_chunks(chunks, n)
+            if self.journal is not None:
+                self.journal.record("generate_n_single_chunk_queries", "chunks", random_chunks)
+        else:
+            # Chunks chosen before the run was interrupted are reused, without evaluating any chunk again
+            random_chunks = [tuple(chunk) for chunk in selected]
+        if self.usage_index is not None and (
+            selected is None or not self.journal.get("generate_dataset", "usage_saved")
+        ):
+            self.usage_index.record(chunk[0] for chunk in random_chunks)
         corpus = {chunk[0]: chunk[1] for chunk in random_chunks}
         queries = {}
         relevant_docs = {}
-        for chunk in tqdm(random_chunks, desc="Generating Queries"):
-            prompt = format_chunk_query_template(chunk[1])
-            query = self.model.run(prompt)['replies'][0]
+        prompts = [format_chunk_query_template(chunk[1]) for chunk in random_chunks]
+        replies = self._run_journaled(prompts, stage="generate_n_single_chunk_queries", desc="Generating Queries")
+        for chunk, query in zip(random_chunks, replies):
             query_id = str(uuid.uuid4())
             queries[query_id] = query
             relevant_docs[query_id] = [chunk[0]]
@@ -557,7 +1055,8 @@ class DatasetGenerator:
             similarity_threshold: Optional[float] = 0.5,
         ) -> List[List[Tuple[str, str]]]:
         """Get n contexts from the chunks. Contexts are defined as a list of chunks, so as to provide sufficient context
-        to generate questions from.
+        to generate questions from. Seeds are drawn and evaluated lazily, a window at a time, until n contexts have been
+        formed or the chunks run out.
 
         Args:
             n (int): Number of contexts to generate.
@@ -573,34 +1072,205 @@ class DatasetGenerator:
             List[List[Tuple[str, str]]]: List of n contexts, where each context is a list of tuples in the form of 
             [(id, chunk), (id, chunk), ...].
         """
-        random_chunks = self.get_n_random_chunks(chunks, 5*n)
+        # Seeds are drawn in the order get_n_random_chunks would draw them, but are only judged once a context is
+        # still needed from them, instead of judging five times as many seeds as contexts up front
+        pool = list(chunks)
+        random.seed(self.seed)
+        random.shuffle(pool)
         contexts = []
-        for random_chunk in tqdm(random_chunks, desc="Building Contexts"):
-            contexts.append([random_chunk])
-            chunk_embedding = self.document_store_wrapper.get_chunk_embedding(random_chunk)
-            similar_chunks = self.document_store_wrapper.retrieve_similar_chunks(
-                chunk_embedding=chunk_embedding, 
-                top_k=10, 
-                sources=sources
-            )
-            for chunk in similar_chunks:
-                i = len(contexts) - 1
-                if len(chunk.content) > chunk_size_threshold and self.evaluate_chunk(chunk.content) == 1:
-                    similarity = 1 - cosine(chunk_embedding, chunk.embedding)
-                    if similarity > similarity_threshold and chunk.content != random_chunk[1]:
-                        contexts[i].append((chunk.id, chunk.content))
-                    elif chunk.content != random_chunk[1]:
+        drawn = 0
+        with tqdm(total=n, desc="Building Contexts") as pbar:
+            while len(contexts) < n and pool:
+                needed = n - len(contexts)
+                if self.speculative_sampling:
+                    # Size the window from the share of drawn seeds that formed a context so far, so that one window is
+                    # likely to form the rest
+                    context_rate = max((len(contexts) + 1) / (drawn + 2), 0.05)
+                    window = math.ceil(needed / context_rate)
+                else:
+                    # Draw as many seeds at once as there are contexts still needed, so that their embeddings and
+                    # neighbours are fetched in bulk and their neighbours are judged together, without judging more
+                    # seeds than taking them one at a time
+                    window = needed
+                candidates = []
+                while len(candidates) < window and pool:
+                    chunk = pool.pop()
+                    if not self._is_saturated(chunk[0]):
+                        candidates.append(chunk)
+                drawn += len(candidates)
+                seeds = [seed for seed, score in zip(candidates, self.evaluate_chunks(candidates)) if score == 1]
+                if not seeds:
+                    continue
+                seed_embeddings = self.document_store_wrapper.get_chunk_embeddings(seeds)
+                neighbours = self.document_store_wrapper.retrieve_similar_chunks_batch(
+                    chunk_embeddings=seed_embeddings, 
+                    top_k=10, 
+                    sources=sources
+                )
+                if self.usage_index is not None:
+                    neighbours = [self.usage_index.exclude_saturated(similar_chunks) for similar_chunks in neighbours]
+                # Only neighbours that could join a context are judged, with the similarities and lengths of every
+                # neighbour in the window checked at once
+                flat_neighbours = [
+                    (seed, chunk) for seed, similar_chunks in zip(seeds, neighbours) for chunk in similar_chunks
+                ]
+                keep = self.document_store_wrapper.neighbour_similarities(
+                    seeds, seed_embeddings, neighbours
+                ) > similarity_threshold
+                keep &= np.fromiter(
+                    (len(chunk.content) for _, chunk in flat_neighbours), dtype=np.int64, count=len(flat_neighbours)
+                ) > chunk_size_threshold
+                to_evaluate = [
+                    (chunk.id, chunk.content) for (seed, chunk), kept in zip(flat_neighbours, keep)
+                    if kept and chunk.content != seed[1]
+                    and self._representative(chunk.id) != self._representative(seed[0])
+                ]
+                verdicts = dict(zip(to_evaluate, self.evaluate_chunks(to_evaluate)))
+                for seed, similar_chunks in zip(seeds, neighbours):
+                    # Chunks may have been saturated by the contexts formed earlier in the window
+                    if self._is_saturated(seed[0]):
                         continue
-                    else:
-                        break
-                if len(contexts[i]) == max_chunks_per_context:
-                    break
-            if len(contexts[i]) <= min_chunks_per_context:
-                contexts.pop()
-            if len(contexts) == n:
-                break
+                    context = [seed]
+                    represented = {self._representative(seed[0])}
+                    for chunk in similar_chunks:
+                        # The seed is usually its own nearest neighbour, and is already in the context, as may be
+                        # near-duplicates of chunks in the context
+                        if chunk.content == seed[1] or self._representative(chunk.id) in represented:
+                            continue
+                        if self._is_saturated(chunk.id):
+                            continue
+                        if verdicts.get((chunk.id, chunk.content)) == 1:
+                            context.append((chunk.id, chunk.content))
+                            represented.add(self._representative(chunk.id))
+                        if len(context) == max_chunks_per_context:
+                            break
+                    if len(context) > min_chunks_per_context and len(contexts) < n:
+                        contexts.append(context)
+                        if self.usage_index is not None:
+                            self.usage_index.record(chunk_id for chunk_id, _ in context)
+                        pbar.update(1)
+        if len(contexts) < n:
+            print(f"Only {len(contexts)} contexts were generated.")
         return contexts
 
+    def get_n_contexts_from_graph(
+            self,
+            n: int,
+            chunks: List[Tuple[str, str]],
+            knn_graph: KNNGraph,
+            max_chunks_per_context: int = 5,
+            min_chunks_per_context: int = 2,
+            chunk_size_threshold: Optional[int] = 200,
+            similarity_threshold: Optional[float] = 0.5,
+        ) -> List[List[Tuple[str, str]]]:
+        """Get n contexts from the chunks, with the neighbours of every seed taken from a precomputed KNNGraph instead of
+        retrieved from the document store. Contexts follow the same rules as get_n_contexts. Seeds whose neighbours in
+        the graph cannot fill a context are skipped before any of them is evaluated.
+
+        Args:
+            n (int): Number of contexts to generate.
+            chunks (List[Tuple[str, str]]): List of chunks to generate contexts from.
+            knn_graph (KNNGraph): Graph of the most similar chunks of every chunk, built with KNNGraph.build.
+            max_chunks_per_context (int): The maximum number of chunks to concatenate together to form a context.
+            min_chunks_per_context (int): The minimum number of chunks to concatenate together to form a context.
+            chunk_size_threshold (int): The threshold for the size of the chunks to be considered for generating questions.
+            similarity_threshold (float): The similarity threshold to be used for filtering similar chunks. Value should be
+                between 0 and 1.
+
+        Returns:
+            List[List[Tuple[str, str]]]: List of n contexts, where each context is a list of tuples in the form of 
+            [(id, chunk), (id, chunk), ...].
+        """
+        chunk_by_id = dict(chunks)
+        candidates = knn_graph.candidates(chunk_by_id, similarity_threshold, chunk_size_threshold)
+        seeds = [
+            (chunk_id, chunk_by_id[chunk_id]) for chunk_id, neighbours in candidates.items()
+            if len(neighbours) >= min_chunks_per_context
+            and (chunk_size_threshold is None or len(chunk_by_id[chunk_id]) > chunk_size_threshold)
+        ]
+        random.Random(self.seed).shuffle(seeds)
+        contexts = []
+        idx = 0
+        with tqdm(total=n, desc="Building Contexts") as pbar:
+            while len(contexts) < n and idx < len(seeds):
+                window = []
+                while len(window) < n - len(contexts) and idx < len(seeds):
+                    if not self._is_saturated(seeds[idx][0]):
+                        window.append(seeds[idx])
+                    idx += 1
+                accepted = [seed for seed, score in zip(window, self.evaluate_chunks(window)) if score == 1]
+                to_evaluate = list(dict.fromkeys(
+                    neighbour for seed in accepted for neighbour in candidates[seed[0]]
+                    if not self._is_saturated(neighbour[0])
+                ))
+                verdicts = dict(zip(to_evaluate, self.evaluate_chunks(to_evaluate)))
+                for seed in accepted:
+                    if self._is_saturated(seed[0]):
+                        continue
+                    context = [seed]
+                    represented = {self._representative(seed[0])}
+                    for neighbour in candidates[seed[0]]:
+                        if self._representative(neighbour[0]) in represented or self._is_saturated(neighbour[0]):
+                            continue
+                        if verdicts.get(neighbour) == 1:
+                            context.append(neighbour)
+                            represented.add(self._representative(neighbour[0]))
+                        if len(context) == max_chunks_per_context:
+                            break
+                    if len(context) > min_chunks_per_context:
+                        contexts.append(context)
+                        if self.usage_index is not None:
+                            self.usage_index.record(neighbour[0] for neighbour in context)
+                        pbar.update(1)
+        if len(contexts) < n:
+            print(f"Only {len(contexts)} contexts were generated.")
+        return contexts
+
+    def _run_journaled(
+            self,
+            prompts: List[str],
+            stage: str,
+            desc: Optional[str] = None,
+            parse: Optional[Callable[[str], Any]] = None,
+        ) -> List[str]:
+        """Run prompts through the executor, checkpointing every reply in the journal as soon as it arrives. Prompts
+        whose replies are already in the journal are not run again. If parse is given, only replies it parses are
+        journaled, and journaled replies it fails to parse are run again, so that a malformed reply is never replayed
+        on resume."""
+        if self.journal is None:
+            return self.executor.run_batch(prompts, stage=stage, desc=desc)
+
+        def parses(reply: Optional[str]) -> bool:
+            if reply is None or parse is None:
+                return reply is not None
+            try:
+                parse(reply)
+            except (ValueError, TypeError, AttributeError):
+                return False
+            return True
+
+        def on_reply(position: int, reply: str) -> None:
+            if parses(reply):
+                self.journal.record(stage, keys[pending[position]], reply)
+
+        keys = [self.journal.make_key(prompt) for prompt in prompts]
+        replies = [self.journal.get(stage, key) for key in keys]
+        pending = [idx for idx, reply in enumerate(replies) if not parses(reply)]
+        new_replies = self.executor.run_batch(
+            [prompts[idx] for idx in pending], stage=stage, desc=desc, on_reply=on_reply
+        )
+        for idx, reply in zip(pending, new_replies):
+            replies[idx] = reply
+        return replies
+
+    def _representative(self, chunk_id: str) -> str:
+        if self.deduplicator is None:
+            return chunk_id
+        return self.deduplicator.cluster_index.representative(chunk_id)
+
+    def _is_saturated(self, chunk_id: str) -> bool:
+        return self.usage_index is not None and self.usage_index.is_saturated(chunk_id)
+
     def get_n_random_chunks(
             self,
             chunks: List[Tuple[str, str]], 
@@ -621,12 +1291,29 @@ class DatasetGenerator:
         usable_chunks = []
         random.seed(self.seed)
         random.shuffle(chunks)
+        evaluated = 0
         with tqdm(total=n, desc="Generating Random Chunks") as pbar:
             while len(usable_chunks) < n and len(chunks) != 0:
-                chunk = chunks.pop()
-                if self.evaluate_chunk(chunk) == 1:
-                    usable_chunks.append(chunk)
-                    pbar.update(1)
+                needed = n - len(usable_chunks)
+                if self.speculative_sampling:
+                    # Size the window from the acceptance rate so far, so that one window is likely to fill the rest
+                    acceptance_rate = max((len(usable_chunks) + 1) / (evaluated + 2), 0.05)
+                    window = math.ceil(needed / acceptance_rate)
+                else:
+                    # Judge as many candidates at once as there are chunks still needed, so that no more chunks are
+                    # evaluated (and accepted) than when popping and evaluating them one at a time
+                    window = needed
+                candidates = [chunks.pop() for _ in range(min(window, len(chunks)))]
+                evaluated += len(candidates)
+                for idx, (chunk, score) in enumerate(zip(candidates, self.evaluate_chunks(candidates))):
+                    if score == 1:
+                        usable_chunks.append(chunk)
+                        pbar.update(1)
+                    if len(usable_chunks) == n:
+                        # Candidates after the n-th accepted chunk are put back, so that the chunks accepted and the
+                        # chunks left over are the same as when evaluating one at a time
+                        chunks.extend(reversed(candidates[idx + 1:]))
+                        break
             if len(usable_chunks) < n:
                 print(f"Only {len(usable_chunks)} chunks were generated.")
         return usable_chunks    
@@ -642,9 +1329,91 @@ class DatasetGenerator:
         Returns:
             float: A score of 1 if the chunk is self-contained and not metadata, 0 otherwise.
         """
-        prompt = format_evaluate_chunk_template(chunk)
+        return self.evaluate_chunks([(None, chunk)])[0]
+
+    def evaluate_chunks(
+            self,
+            chunks: List[Tuple[str, str]],
+            desc: Optional[str] = None,
+        ) -> List[float]:
+        """
+        Evaluate a list of chunks concurrently. Scores are returned in the same order as the chunks provided, and follow
+        the same rules as evaluate_chunk. Chunks that already have a verdict in the verdict store are not sent to the
+        language model, and new verdicts are added to the store. If a pre-filter is set, chunks it rejects score 0
+        without being sent to the language model. Rejections are kept for the rest of the run rather than in the verdict
+        store, so that each chunk is only checked once per run. If evaluation_batch_size is above 1, chunks are judged
+        in batches with a single prompt each, and any chunk missing from a batch reply is judged on its own instead.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to be evaluated in format (id, chunk).
+            desc (str): Description for the progress bar. No progress bar is shown if not provided (default: None).
+
+        Returns:
+            List[float]: A score for each chunk, 1 if the chunk is self-contained and not metadata, 0 otherwise.
+        """
+        pending = {}
+        for chunk_id, chunk in chunks:
+            key = self.verdict_store.make_key(chunk_id, chunk)
+            if key not in self.prefilter_rejections and self.verdict_store.get(chunk_id, chunk) is None:
+                pending[key] = (chunk_id, chunk)
+        pending_chunks = list(pending.values())
+        if self.prefilter is not None and pending_chunks:
+            mask = self.prefilter.reject_mask([chunk for _, chunk in pending_chunks])
+            self.prefilter_rejections.update(key for key, reject in zip(pending.keys(), mask) if reject)
+            pending_chunks = [chunk for chunk, reject in zip(pending_chunks, mask) if not reject]
+
+        batch_size = self.evaluation_batch_size
+        batches = [pending_chunks[i:i + batch_size] for i in range(0, len(pending_chunks), batch_size)]
+        batches = [batch for batch in batches if len(batch) > 1]
+        if batches:
+            prompts = [format_evaluate_chunks_batch_template([chunk for _, chunk in batch]) for batch in batches]
+            replies = self.executor.run_batch(prompts, stage="evaluate_chunk", desc=desc)
+            for batch, reply in zip(batches, replies):
+                for (chunk_id, chunk), score in zip(batch, self._parse_batch_chunk_evaluation(reply, len(batch))):
+                    if score is not None:
+                        self.verdict_store.set(chunk_id, chunk, score)
+            pending_chunks = [
+                (chunk_id, chunk) for chunk_id, chunk in pending_chunks 
+                if self.verdict_store.get(chunk_id, chunk) is None
+            ]
+
+        prompts = [format_evaluate_chunk_template(chunk) for _, chunk in pending_chunks]
+        replies = self.executor.run_batch(prompts, stage="evaluate_chunk", desc=desc)
+        for (chunk_id, chunk), reply in zip(pending_chunks, replies):
+            self.verdict_store.set(chunk_id, chunk, self._parse_chunk_evaluation(reply))
+        return [
+            0 if self.verdict_store.make_key(chunk_id, chunk) in self.prefilter_rejections
+            else self.verdict_store.get(chunk_id, chunk)
+            for chunk_id, chunk in chunks
+        ]
+
+    def prefill_chunk_verdicts(
+            self,
+            chunks: List[Tuple[str, str]],
+            chunk_size_threshold: Optional[int] = 200,
+        ) -> int:
+        """
+        Evaluate every chunk in the corpus in one bulk pass, so that later calls to generate_dataset only read verdicts
+        from the verdict store. Chunks that already have a verdict are skipped, and the store is saved if it has a path.
+
+        Args:
+            chunks (List[Tuple[str, str]]): List of chunks to evaluate in format (id, chunk).
+            chunk_size_threshold (int): Chunks with this many characters or fewer are skipped, as they are never
+                considered for generation.
+
+        Returns:
+            int: The number of chunks that passed evaluation.
+        """
+        chunks = [chunk for chunk in chunks if len(chunk[1]) > chunk_size_threshold]
+        scores = self.evaluate_chunks(chunks, desc="Evaluating Chunks")
+        if self.verdict_store.path:
+            self.verdict_store.save()
+        return sum(1 for score in scores if score == 1)
+
+    @staticmethod
+    def _parse_chunk_evaluation(reply: str) -> float:
         try:
-            res = json.loads(self.model.run(prompt)['replies'][0])
+            res = json.loads(reply)
         except json.JSONDecodeError as e:
             print(f"JSON decoding failed: {e}")
             print("Falling back to default score of 0.")
@@ -652,6 +1421,25 @@ class DatasetGenerator:
         if res.get('self_containment') == 0 or res.get('not_metadata') == 0:
             return 0
         return 1
+
+    @staticmethod
+    def _parse_batch_chunk_evaluation(reply: str, batch_size: int) -> List[Optional[float]]:
+        try:
+            res = json.loads(reply)
+        except json.JSONDecodeError as e:
+            print(f"JSON decoding failed: {e}")
+            print("Falling back to evaluating chunks individually.")
+            return [None] * batch_size
+        scores = [None] * batch_size
+        if not isinstance(res, list):
+            return scores
+        for verdict in res:
+            if not isinstance(verdict, dict) or not isinstance(verdict.get('id'), int):
+                continue
+            idx = verdict['id'] - 1
+            if 0 <= idx < batch_size and scores[idx] is None:
+                scores[idx] = 0 if verdict.get('self_containment') == 0 or verdict.get('not_metadata') == 0 else 1
+        return scores
         
     def separate_query(self, dataset: myDataset, json_path: str) -> myDataset:
         """
@@ -667,30 +1455,37 @@ class DatasetGenerator:
         queries = dataset.queries
         corpus = dataset.corpus
         relevant_docs = dataset.relevant_docs
+        question_words = ["what", "how", "why", "when", "where", "who", "which"]
+
+        # Pull out every query that contains more than one question, then separate them concurrently
+        to_separate = []
         for query_id, query in queries.copy().items():
-            chunks = []
-            doc_ids = []
-            question_words = ["what", "how", "why", "when", "where", "who", "which"]
-            for i in question_words:
-                if "and " + i in query:
-                    doc_ids = relevant_docs[query_id]
-                    queries.pop(query_id)
-                    relevant_docs.pop(query_id)
-            chunks = [corpus[doc_id] for doc_id in doc_ids]
-            if len(chunks) > 0:
-                prompt = format_separating_multi_query_template(query, chunks)
-                res = json.loads(self.model.run(prompt)['replies'][0])
-                for new_query, new_chunks in res.items():
-                    if len(new_chunks) > 1:
-                        chunks_for_new_query = []
-                        doc_ids_for_new_query = []
-                        new_query_id = str(uuid.uuid4())
-                        queries.update({new_query_id: new_query})
-                        for i in new_chunks:
-                            idx = i-1
-                            chunks_for_new_query.append(chunks[idx])
-                            doc_ids_for_new_query.append(doc_ids[idx])
-                        relevant_docs.update({new_query_id: doc_ids_for_new_query})
+            if any("and " + i in query for i in question_words):
+                doc_ids = relevant_docs.pop(query_id)
+                queries.pop(query_id)
+                chunks = [corpus[doc_id] for doc_id in doc_ids]
+                if len(chunks) > 0:
+                    to_separate.append((doc_ids, chunks, format_separating_multi_query_template(query, chunks)))
+        replies = self._run_journaled(
+            [prompt for _, _, prompt in to_separate],
+            stage="separate_query",
+            desc="Separating Queries",
+            parse=lambda reply: json.loads(reply).items(),
+        )
+
+        for (doc_ids, chunks, _), reply in zip(to_separate, replies):
+            res = json.loads(reply)
+            for new_query, new_chunks in res.items():
+                if len(new_chunks) > 1:
+                    chunks_for_new_query = []
+                    doc_ids_for_new_query = []
+                    new_query_id = str(uuid.uuid4())
+                    queries.update({new_query_id: new_query})
+                    for i in new_chunks:
+                        idx = i-1
+                        chunks_for_new_query.append(chunks[idx])
+                        doc_ids_for_new_query.append(doc_ids[idx])
+                    relevant_docs.update({new_query_id: doc_ids_for_new_query})
         dataset = myDataset(
             queries=queries, 
             corpus=corpus, 
@@ -713,14 +1508,14 @@ class DatasetGenerator:
         Returns:
             myDataset: The updated dataset with the expected answers.
         """
-        answers = {}
-        for query_id, query in tqdm(dataset.queries.items(), desc="Answering Queries"):
+        query_ids = list(dataset.queries.keys())
+        prompts = []
+        for query_id in query_ids:
             chunk_ids = dataset.relevant_docs[query_id]
             chunks = [dataset.corpus[chunk_id] for chunk_id in chunk_ids]
-            prompt = format_answer_query_template(query, chunks)
-            res = self.model.run(prompt)['replies'][0]
-            answers[query_id] = res
-        dataset.expected_answers = answers
+            prompts.append(format_answer_query_template(dataset.queries[query_id], chunks))
+        replies = self._run_journaled(prompts, stage="answer_query", desc="Answering Queries")
+        dataset.expected_answers = dict(zip(query_ids, replies))
         
         # Export checkpoint data to json path
         if json_path:
@@ -0,0 +1,427 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import os
+import re
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+# Libs
+import numpy as np
+
+# Custom
+if TYPE_CHECKING:
+    from .dataset_generation import myDataset
+
+############################################
+# MinHash Signatures - _minhash_signatures #
+############################################
+
+# Prime just above 2**32, so that every 32-bit shingle hash is below it
+_PRIME = np.uint64(4294967311)
+_WORD = re.compile(r"\w+")
+
+def _shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    """32-bit hash of every word shingle of a text. Texts shorter than a shingle are hashed whole."""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64)
+
+def _minhash_signatures(texts: List[str], shingle_size: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """MinHash signature of every text, with one universal hash function (a * x + b) mod p for every permutation."""
+    signatures = np.empty((len(texts), len(a)), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        hashes = _shingle_hashes(text, shingle_size)
+        signatures[row] = ((a[:, None] * hashes[None, :] + b[:, None]) % _PRIME).min(axis=1)
+    return signatures
+
+#####################################
+# Cluster Index - ChunkClusterIndex #
+#####################################
+
+class ChunkClusterIndex:
+    """Index of the near-duplicate clusters found among chunks, mapping every chunk id to the id of the chunk kept as its
+    cluster's representative. The MinHash signature of every chunk is kept too, so that chunks added in later runs are
+    compared against every chunk seen before without hashing those again. The index can be saved to and loaded from a
+    .npz file between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Initialises the ChunkClusterIndex class. An index already saved at path is loaded.
+
+        Args:
+            path (str): The .npz file to load the index from and save the index to. The index is only kept in memory if
+                not provided (default: None).
+        """
+        self.path = path
+        self.ids: List[str] = []
+        self.signatures: Optional[np.ndarray] = None
+        self.representatives: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            saved = np.load(path, allow_pickle=False)
+            self.ids = saved["ids"].tolist()
+            self.signatures = saved["signatures"]
+            self.representatives = dict(zip(self.ids, saved["representatives"].tolist()))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self.representatives
+
+    def representative(self, chunk_id: str) -> str:
+        """Get the representative of a chunk's cluster.
+
+        Args:
+            chunk_id (str): The id of the chunk.
+
+        Returns:
+            str: The id of the representative, which is the chunk itself if it has no near-duplicates or is not indexed.
+        """
+        return self.representatives.get(chunk_id, chunk_id)
+
+    def is_duplicate(self, chunk_id: str) -> bool:
+        """Check whether a chunk is a near-duplicate of another chunk kept as its cluster's representative.
+
+        Args:
+            chunk_id (str): The id of the chunk.
+
+        Returns:
+            bool: True if the chunk should be dropped in favour of its representative.
+        """
+        return self.representative(chunk_id) != chunk_id
+
+    @property
+    def clusters(self) -> Dict[str, List[str]]:
+        """Dict[str, List[str]]: Mapping of every representative with near-duplicates to the ids of its cluster."""
+        clusters: Dict[str, List[str]] = {}
+        for chunk_id, representative in self.representatives.items():
+            clusters.setdefault(representative, []).append(chunk_id)
+        return {representative: members for representative, members in clusters.items() if len(members) > 1}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the index as a .npz file.
+
+        Args:
+            path (str): The file path to save to. Defaults to the path the index was initialised with.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path provided to save the cluster index to.")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        signatures = self.signatures if self.signatures is not None else np.zeros((0, 0), dtype=np.uint64)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.asarray(self.ids, dtype=str),
+                signatures=signatures,
+                representatives=np.asarray([self.representatives[chunk_id] for chunk_id in self.ids], dtype=str),
+            )
+
+#####################################
+# Deduplication - ChunkDeduplicator #
+#####################################
+
+class ChunkDeduplicator:
+    """Local near-duplicate detection that runs before chunks are sent to the language model, so that repeated
+    disclaimers, versions of the same document and overlapping chunks do not each cost LLM calls and yield duplicate
+    questions. Chunks are compared by the Jaccard similarity of their word shingles, estimated with MinHash signatures,
+    and candidate pairs are found with locality-sensitive hashing (LSH) over bands of the signatures instead of comparing
+    every pair. Signatures are computed on several processes at once. The first chunk of every cluster is kept as its
+    representative, and the clusters are recorded in a ChunkClusterIndex.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.8,
+            num_perm: int = 64,
+            bands: int = 16,
+            shingle_size: int = 3,
+            max_workers: Optional[int] = None,
+            block_size: int = 2000,
+            cluster_index: Optional[ChunkClusterIndex] = None,
+            seed: int = 0,
+        ) -> None:
+        """Initialises the ChunkDeduplicator class.
+
+        Args:
+            threshold (float): The estimated Jaccard similarity above which two chunks are near-duplicates
+                (default: 0.8).
+            num_perm (int): The number of hash functions in every MinHash signature (default: 64).
+            bands (int): The number of LSH bands the signatures are split into. More bands find more candidate pairs
+                with lower similarity. Must divide num_perm (default: 16).
+            shingle_size (int): The number of words in every shingle (default: 3).
+            max_workers (int): The number of processes signatures are computed on. Defaults to the number of cores.
+            block_size (int): The number of chunks hashed by every task (default: 2000).
+            cluster_index (ChunkClusterIndex): The index to record clusters in. Provide an index with a path to reuse
+                it between runs. An in-memory index is used if not provided (default: None).
+            seed (int): Seed for the hash functions, which must not change between runs sharing an index (default: 0).
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f"bands must divide num_perm, got {bands} bands for {num_perm} permutations.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.cluster_index = cluster_index if cluster_index is not None else ChunkClusterIndex()
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.removed = 0
+        self.checked = 0
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """Compute the MinHash signature of every text, in blocks spread across processes.
+
+        Args:
+            texts (List[str]): The texts to compute signatures for.
+
+        Returns:
+            np.ndarray: Matrix with the signature of every text as a row.
+        """
+        blocks = [texts[start:start + self.block_size] for start in range(0, len(texts), self.block_size)]
+        if self.max_workers == 1 or len(blocks) <= 1:
+            results = [_minhash_signatures(block, self.shingle_size, self.a, self.b) for block in blocks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(
+                    _minhash_signatures,
+                    blocks,
+                    [self.shingle_size] * len(blocks),
+                    [self.a] * len(blocks),
+                    [self.b] * len(blocks),
+                ))
+        if not results:
+            return np.zeros((0, self.num_perm), dtype=np.uint64)
+        return np.concatenate(results)
+
+    def index_chunks(self, chunks: List[Tuple[str, str]]) -> ChunkClusterIndex:
+        """Add chunks to the cluster index, clustering them with every chunk indexed before. Chunks already in the index
+        are not hashed again, and keep their representative.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to index, in the form of (id, chunk).
+
+        Returns:
+            ChunkClusterIndex: The updated cluster index.
+        """
+        index = self.cluster_index
+        new_chunks = list(dict(chunk for chunk in chunks if chunk[0] not in index).items())
+        if not new_chunks:
+            return index
+        new_signatures = self.signatures([text for _, text in new_chunks])
+        signatures = new_signatures if index.signatures is None or not len(index.signatures) else np.concatenate(
+            [index.signatures, new_signatures]
+        )
+        ids = index.ids + [chunk_id for chunk_id, _ in new_chunks]
+        # Union-find over every indexed chunk, where the root of every cluster is its earliest chunk
+        parents = np.arange(len(ids))
+        row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        for chunk_id, representative in index.representatives.items():
+            parents[row_of[chunk_id]] = row_of[representative]
+
+        def find(row: int) -> int:
+            while parents[row] != row:
+                parents[row] = parents[parents[row]]
+                row = parents[row]
+            return row
+
+        rows_per_band = self.num_perm // self.bands
+        first_new = len(index.ids)
+        for band in range(self.bands):
+            band_keys = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+            _, bucket, counts = np.unique(
+                band_keys.view(np.dtype((np.void, band_keys.dtype.itemsize * rows_per_band))).ravel(),
+                return_inverse=True,
+                return_counts=True,
+            )
+            order = np.argsort(bucket, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)))
+            for group in np.flatnonzero(counts > 1):
+                members = order[starts[group]:starts[group + 1]]
+                if members[-1] < first_new:
+                    # Buckets of chunks that were all indexed before were already clustered
+                    continue
+                leader = members[0]
+                agreement = (signatures[members[1:]] == signatures[leader]).mean(axis=1)
+                for member in members[1:][agreement >= self.threshold]:
+                    root_leader, root_member = find(leader), find(member)
+                    if root_leader != root_member:
+                        parents[max(root_leader, root_member)] = min(root_leader, root_member)
+        index.ids = ids
+        index.signatures = signatures
+        index.representatives = {chunk_id: ids[find(row)] for row, chunk_id in enumerate(ids)}
+        return index
+
+    def deduplicate(self, chunks: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Remove near-duplicate chunks, keeping the representative of every cluster, or the first chunk of the cluster
+        among the chunks provided if its representative is not one of them. Exact duplicates of the same id are removed
+        too.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to deduplicate, in the form of (id, chunk).
+
+        Returns:
+            List[Tuple[str, str]]: The chunks kept, in their original order.
+        """
+        self.index_chunks(chunks)
+        kept, seen = [], set()
+        for chunk in chunks:
+            representative = self.cluster_index.representative(chunk[0])
+            if representative not in seen:
+                seen.add(representative)
+                kept.append(chunk)
+        self.checked += len(chunks)
+        self.removed += len(chunks) - len(kept)
+        if self.cluster_index.path:
+            self.cluster_index.save()
+        return kept
+
+    def reset_stats(self) -> None:
+        """Reset the removal counts, for eg. at the start of a new run."""
+        self.removed = 0
+        self.checked = 0
+
+    def report(self) -> str:
+        """Summarise the number of chunks removed since the counts were last reset.
+
+        Returns:
+            str: A one-line report of chunks removed and clusters found.
+        """
+        return (
+            f"Deduplication: {self.removed} of {self.checked} chunks removed as near-duplicates, "
+            f"{len(self.cluster_index.clusters)} clusters in the index."
+        )
+
+#####################################
+# Deduplication - QueryDeduplicator #
+#####################################
+
+class QueryDeduplicator:
+    """Drops near-duplicate queries of a dataset before they are answered, so that the near-identical questions generic
+    chunks tend to yield do not each cost an answer-generation call. Queries are compared by the Jaccard similarity of
+    their word n-grams, or by the cosine similarity of their embeddings if an embedder is provided. Queries are visited
+    in dataset order, and every query that is a near-duplicate of a query kept before it is dropped, so that
+    near-duplicates do not chain together. Queries with the same relevant chunks, such as an original query and its
+    evolutions, are never compared, as they are meant to ask about the same chunks differently.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.8,
+            shingle_size: int = 2,
+            embedder: Optional[Any] = None,
+            embedding_threshold: float = 0.95,
+            max_workers: int = 8,
+            block_size: int = 1024,
+        ) -> None:
+        """Initialises the QueryDeduplicator class.
+
+        Args:
+            threshold (float): The Jaccard similarity of word n-grams above which two queries are near-duplicates
+                (default: 0.8).
+            shingle_size (int): The number of words in every n-gram. Queries are short, so this is smaller than for
+                chunks (default: 2).
+            embedder (Any): Haystack text embedder, for eg. the one used to embed the chunks in the document store, whose
+                run(text=...) method returns a dict with an "embedding". Queries are compared by n-grams if not provided
+                (default: None).
+            embedding_threshold (float): The cosine similarity of embeddings above which two queries are near-duplicates
+                (default: 0.95).
+            max_workers (int): The number of queries embedded at the same time (default: 8).
+            block_size (int): The number of queries whose embedding similarities are computed at once (default: 1024).
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.embedder = embedder
+        self.embedding_threshold = embedding_threshold
+        self.max_workers = max_workers
+        self.block_size = block_size
+        self.dropped = 0
+        self.checked = 0
+
+    def _similar_ngrams(self, queries: List[str]) -> List[np.ndarray]:
+        """Earlier queries every query is a near-duplicate of by n-grams, found through an inverted index of n-grams."""
+        shingles = [set(_shingle_hashes(query, self.shingle_size).tolist()) for query in queries]
+        postings: Dict[int, List[int]] = {}
+        similar = []
+        for row, query_shingles in enumerate(shingles):
+            shared = Counter(earlier for shingle in query_shingles for earlier in postings.get(shingle, ()))
+            similar.append(np.asarray(sorted(
+                earlier for earlier, count in shared.items()
+                if count / (len(query_shingles) + len(shingles[earlier]) - count) >= self.threshold
+            ), dtype=np.int64))
+            for shingle in query_shingles:
+                postings.setdefault(shingle, []).append(row)
+        return similar
+
+    def _similar_embeddings(self, queries: List[str]) -> List[np.ndarray]:
+        """Earlier queries every query is a near-duplicate of by embeddings, computed in blocks of rows."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            embeddings = np.asarray(list(executor.map(
+                lambda query: self.embedder.run(text=query)["embedding"], queries
+            )), dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        similar = []
+        for start in range(0, len(queries), self.block_size):
+            block = embeddings[start:start + self.block_size]
+            scores = block @ embeddings[:start + len(block)].T
+            for offset, row_scores in enumerate(scores):
+                similar.append(np.flatnonzero(row_scores[:start + offset] >= self.embedding_threshold))
+        return similar
+
+    def deduplicate(self, dataset: "myDataset") -> "myDataset":
+        """Drop near-duplicate queries in place, along with their relevant chunks and expected answers. The queries kept
+        are left untouched, so that their relevant chunks stay the ones they were generated from.
+
+        Args:
+            dataset (myDataset): The dataset to deduplicate.
+
+        Returns:
+            myDataset: The deduplicated dataset.
+        """
+        query_ids = list(dataset.queries.keys())
+        queries = [dataset.queries[query_id] for query_id in query_ids]
+        similar = self._similar_embeddings(queries) if self.embedder is not None else self._similar_ngrams(queries)
+        # Queries are grouped by their relevant chunks, which evolutions copy from the query they were evolved from
+        group_ids: Dict[Tuple[str, ...], int] = {}
+        groups = np.asarray([
+            group_ids.setdefault(tuple(sorted(dataset.relevant_docs.get(query_id, []))), len(group_ids))
+            for query_id in query_ids
+        ], dtype=np.int64)
+        kept = np.zeros(len(query_ids), dtype=bool)
+        dropped = []
+        for row, earlier in enumerate(similar):
+            if np.any(kept[earlier] & (groups[earlier] != groups[row])):
+                dropped.append(query_ids[row])
+            else:
+                kept[row] = True
+        for query_id in dropped:
+            del dataset.queries[query_id]
+            dataset.relevant_docs.pop(query_id, None)
+            if dataset.expected_answers:
+                dataset.expected_answers.pop(query_id, None)
+        self.checked += len(query_ids)
+        self.dropped += len(dropped)
+        return dataset
+
+    def reset_stats(self) -> None:
+        """Reset the drop counts, for eg. at the start of a new run."""
+        self.dropped = 0
+        self.checked = 0
+
+    def report(self) -> str:
+        """Summarise the number of queries dropped since the counts were last reset.
+
+        Returns:
+            str: A one-line report of queries dropped.
+        """
+        method = "embeddings" if self.embedder is not None else f"{self.shingle_size}-grams"
+        return f"Query deduplication: {self.dropped} of {self.checked} queries dropped as near-duplicates by {method}."
@@ -0,0 +1,800 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Libs
+import numpy as np
+import pandas as pd
+from haystack import Document
+from tqdm import tqdm
+
+# Custom
+from .caching import EmbeddingCache
+from .dataset_generation import DocumentStoreWrapper
+
+#####################################################
+# In-memory Integration - NumpyDocumentStoreWrapper #
+#####################################################
+
+class NumpyDocumentStoreWrapper(DocumentStoreWrapper):
+    """In-memory document store for offline runs and CI, where generating a dataset should not need a Milvus server.
+    Chunk embeddings are kept normalised in one contiguous float32 matrix, so similar chunks are found by exact cosine
+    similarity with a single matrix product instead of a network round trip. Sources are stored as integer codes, with
+    the rows of each source indexed up front, so that source filters are built without scanning every row. Chunks can
+    be loaded from a Parquet table of ids, texts and sources, with embeddings in a .npy file or a Parquet column.
+    """
+
+    def __init__(
+            self,
+            ids: List[str],
+            texts: List[str],
+            sources: List[str],
+            embeddings: np.ndarray,
+            max_cached_masks: int = 8,
+            normalise: bool = True,
+        ) -> None:
+        """Initialises the NumpyDocumentStoreWrapper class.
+
+        Args:
+            ids (List[str]): The id of every chunk.
+            texts (List[str]): The text of every chunk.
+            sources (List[str]): The source of every chunk.
+            embeddings (np.ndarray): Matrix with the embedding of every chunk as a row.
+            max_cached_masks (int): The number of source filters kept in memory, for eg. one for each of the train,
+                validation and test splits (default: 8).
+            normalise (bool): Whether to normalise the embeddings, into a new matrix. Turn off for embeddings that are
+                already normalised, for eg. memory-mapped ones, so that they are not copied into memory (default: True).
+        """
+        if not len(ids) == len(texts) == len(sources) == len(embeddings):
+            raise ValueError("ids, texts, sources and embeddings must have the same length.")
+        self.ids = np.asarray(ids, dtype=object)
+        self.texts = np.asarray(texts, dtype=object)
+        self.source_names, self.source_index = np.unique(np.asarray(sources, dtype=object), return_inverse=True)
+        self.source_index = self.source_index.astype(np.int32)
+        if normalise:
+            # Normalised into a new matrix, so that the caller's embeddings are left as they are
+            norms = np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            self.embeddings = np.ascontiguousarray(np.divide(embeddings, norms, dtype=np.float32))
+        else:
+            self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.max_cached_masks = max_cached_masks
+        self._index_rows()
+
+    def _index_rows(self) -> None:
+        """Index the rows by id and by source, once ids, source_names and source_index are set."""
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        # Rows sorted by source, with the offsets of each source, so the rows of any source are a single slice
+        self.rows_by_source = np.argsort(self.source_index, kind='stable')
+        self.source_offsets = np.concatenate(([0], np.cumsum(np.bincount(
+            self.source_index, minlength=len(self.source_names)
+        ))))
+        self.source_codes = {source: code for code, source in enumerate(self.source_names)}
+        self.source_masks: "OrderedDict[Tuple[str, ...], np.ndarray]" = OrderedDict()
+        self.mask_lock = threading.Lock()
+
+    @classmethod
+    def from_parquet(
+            cls,
+            path: str,
+            embeddings_path: Optional[str] = None,
+            id_column: str = "id",
+            text_column: str = "text",
+            source_column: str = "source",
+            embedding_column: str = "vector",
+        ) -> "NumpyDocumentStoreWrapper":
+        """Load chunks from a Parquet table, for eg. one exported from Milvus.
+
+        Args:
+            path (str): The Parquet file with a row for every chunk.
+            embeddings_path (str): A .npy file with the embedding of every chunk, in the same order as the rows of the
+                table. Embeddings are read from embedding_column if not provided (default: None).
+            id_column (str): The column with the chunk ids (default: "id").
+            text_column (str): The column with the chunk texts (default: "text").
+            source_column (str): The column with the chunk sources (default: "source").
+            embedding_column (str): The column with the chunk embeddings, used if embeddings_path is not provided
+                (default: "vector").
+
+        Returns:
+            NumpyDocumentStoreWrapper: The store with the chunks loaded.
+        """
+        columns = [id_column, text_column, source_column]
+        if embeddings_path is None:
+            columns.append(embedding_column)
+        table = pd.read_parquet(path, columns=columns)
+        if embeddings_path is None:
+            embeddings = np.stack(table[embedding_column].to_numpy()).astype(np.float32)
+        else:
+            embeddings = np.load(embeddings_path)
+        return cls(
+            ids=table[id_column].astype(str).tolist(),
+            texts=table[text_column].tolist(),
+            sources=table[source_column].tolist(),
+            embeddings=embeddings,
+        )
+
+    def save(self, path: str, embeddings_path: Optional[str] = None) -> None:
+        """Save the chunks as a Parquet table of ids, texts and sources, and the embeddings as a .npy file, which can be
+        loaded again with from_parquet.
+
+        Args:
+            path (str): The Parquet file to save the chunks to.
+            embeddings_path (str): The .npy file to save the embeddings to. Defaults to path with a .npy extension.
+        """
+        embeddings_path = embeddings_path or os.path.splitext(path)[0] + '.npy'
+        for file_path in (path, embeddings_path):
+            directory = os.path.dirname(file_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+        pd.DataFrame({
+            "id": self.ids,
+            "text": self.texts,
+            "source": self.source_names[self.source_index],
+        }).to_parquet(path, index=False)
+        np.save(embeddings_path, self.embeddings)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _source_mask(self, sources: Optional[List[str]]) -> Optional[np.ndarray]:
+        """Boolean mask of the rows in the sources provided, or None if every row is allowed."""
+        if not sources:
+            return None
+        key = tuple(sorted(sources))
+        with self.mask_lock:
+            if key in self.source_masks:
+                self.source_masks.move_to_end(key)
+                return self.source_masks[key]
+            mask = np.zeros(len(self.ids), dtype=bool)
+            for source in key:
+                code = self.source_codes.get(source)
+                if code is not None:
+                    mask[self.rows_by_source[self.source_offsets[code]:self.source_offsets[code + 1]]] = True
+            self.source_masks[key] = mask
+            if len(self.source_masks) > self.max_cached_masks:
+                self.source_masks.popitem(last=False)
+            return mask
+
+    def _chunks(self, rows: np.ndarray) -> List[Tuple[str, str]]:
+        return list(zip(self.ids[rows].tolist(), self.texts[rows].tolist()))
+
+    def _source_rows(self, sources: List[str]) -> np.ndarray:
+        codes = [self.source_codes[source] for source in sources if source in self.source_codes]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([
+            self.rows_by_source[self.source_offsets[code]:self.source_offsets[code + 1]] for code in codes
+        ]))
+
+    def get_all_sources(self) -> List[str]:
+        """Get all document sources in the store.
+
+        Returns:
+            List[str]: List of sources, in sorted order.
+        """
+        return self.source_names.tolist()
+
+    def get_source_counts(self) -> Dict[str, int]:
+        """Get the number of chunks in every source.
+
+        Returns:
+            Dict[str, int]: Mapping of source to its number of chunks.
+        """
+        return dict(zip(self.source_names.tolist(), np.diff(self.source_offsets).tolist()))
+
+    def get_chunks_from_sources(
+            self,
+            sources: List[str]
+        ) -> List[Tuple[str, str]]:
+        """Get the chunks from the sources provided.
+
+        Args:
+            sources (List[str]): List of sources to get chunks from.
+
+        Returns:
+            List[Tuple[str, str]]: List of chunks. Each chunk is a tuple in the form of (id, chunk).
+        """
+        return self._chunks(self._source_rows(sources))
+
+    def iter_chunks_from_sources(
+            self,
+            sources: List[str],
+            batch_size: int = 1000
+        ) -> Iterator[List[Tuple[str, str]]]:
+        """Iterate over the chunks from the sources provided, one page at a time.
+
+        Args:
+            sources (List[str]): List of sources to get chunks from.
+            batch_size (int): The number of chunks in each page (default: 1000).
+
+        Yields:
+            List[Tuple[str, str]]: A page of chunks. Each chunk is a tuple in the form of (id, chunk).
+        """
+        rows = self._source_rows(sources)
+        for start in range(0, len(rows), batch_size):
+            yield self._chunks(rows[start:start + batch_size])
+
+    def get_chunk_embedding(self, chunk: Tuple[str, str]) -> List[float]:
+        """Get the embedding of a chunk.
+
+        Args:
+            chunk (Tuple[str, str]): The chunk to get the embedding of. Chunk comes in the form of (id, chunk).
+
+        Returns:
+            List[float]: The normalised embedding of the chunk.
+        """
+        return self.embeddings[self.rows[chunk[0]]].tolist()
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]]) -> List[List[float]]:
+        """Get the embeddings of many chunks at once.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to get the embeddings of, in the form of (id, chunk).
+
+        Returns:
+            List[List[float]]: The normalised embedding of every chunk, in the same order as the chunks.
+        """
+        return self.embeddings[[self.rows[chunk[0]] for chunk in chunks]].tolist()
+
+    def retrieve_similar_chunks(
+            self,
+            chunk_embedding: List[float],
+            top_k: int,
+            sources: Optional[List[str]]
+        ) -> List[Document]:
+        """Retrieve the top_k chunks most similar to chunk_embedding, by exact cosine similarity.
+
+        Args:
+            chunk_embedding (List[float]): The embedding of the chunk to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+
+        Returns:
+            List[Document]: The similar chunks, most similar first, with their embeddings and scores.
+        """
+        return self.retrieve_similar_chunks_batch([chunk_embedding], top_k, sources)[0]
+
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]],
+            batch_size: int = 64,
+        ) -> List[List[Document]]:
+        """Retrieve the top_k chunks most similar to each of many embeddings, by exact cosine similarity. Embeddings are
+        scored against the corpus a batch at a time with a single matrix product.
+
+        Args:
+            chunk_embeddings (List[List[float]]): The embeddings to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve for each embedding.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+            batch_size (int): The number of embeddings scored against the corpus at once (default: 64).
+
+        Returns:
+            List[List[Document]]: The similar chunks of every embedding, most similar first, with their embeddings and
+                scores.
+        """
+        queries = np.asarray(chunk_embeddings, dtype=np.float32).reshape(len(chunk_embeddings), -1)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        mask = self._source_mask(sources)
+        candidates = None
+        if mask is not None and mask.sum() < len(mask) // 2:
+            # Small filters are cheaper to score on their own rows than to mask out of the whole corpus
+            candidates = np.flatnonzero(mask)
+            matrix = self.embeddings[candidates]
+        else:
+            matrix = self.embeddings
+        top_k = min(top_k, len(candidates) if candidates is not None else int(mask.sum()) if mask is not None
+                    else len(self.ids))
+        results = []
+        for start in range(0, len(queries), batch_size):
+            scores = self._score(queries[start:start + batch_size], matrix)
+            if candidates is None and mask is not None:
+                scores[:, ~mask] = -np.inf
+            for row_scores in scores:
+                if top_k <= 0:
+                    results.append([])
+                    continue
+                top = np.argpartition(-row_scores, top_k - 1)[:top_k]
+                top = top[np.argsort(-row_scores[top], kind='stable')]
+                rows = candidates[top] if candidates is not None else top
+                results.append([self._to_document(row, float(score)) for row, score in zip(rows, row_scores[top])])
+        return results
+
+    @staticmethod
+    def _score(queries: np.ndarray, matrix: np.ndarray, block_size: int = 65536) -> np.ndarray:
+        """Cosine similarity of every query to every row of matrix, a block of rows at a time, so that float16 or
+        memory-mapped embeddings are converted to float32 one block at a time rather than all at once."""
+        if matrix.dtype == np.float32 and len(matrix) <= block_size:
+            return queries @ matrix.T
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), block_size):
+            scores[:, start:start + block_size] = queries @ np.asarray(
+                matrix[start:start + block_size], dtype=np.float32
+            ).T
+        return scores
+
+    def _to_document(self, row: int, score: float) -> Document:
+        chunk_id, text = self._chunks([row])[0]
+        return Document(
+            id=chunk_id,
+            content=text,
+            embedding=self.embeddings[row].tolist(),
+            meta={"source": self.source_names[self.source_index[row]]},
+            score=score,
+        )
+
+################################################
+# Approximate Search - IVFDocumentStoreWrapper #
+################################################
+
+def _nearest_centroids(
+        embeddings: np.ndarray,
+        centroids: np.ndarray,
+        executor: ThreadPoolExecutor,
+        block_size: int = 16384,
+    ) -> np.ndarray:
+    """Index of the most similar centroid of every embedding. Blocks of embeddings are scored on the executor's threads,
+    as NumPy releases the GIL during the matrix products."""
+    blocks = executor.map(
+        lambda start: np.argmax(embeddings[start:start + block_size] @ centroids.T, axis=1),
+        range(0, len(embeddings), block_size),
+    )
+    return np.concatenate(list(blocks)).astype(np.int32)
+
+class IVFDocumentStoreWrapper(NumpyDocumentStoreWrapper):
+    """Document store backed by a local inverted file (IVF) index, for corpora too large for exact search. Embeddings
+    are clustered with spherical k-means, and chunks are stored in the order of their cluster, so that the chunks of
+    every cluster are a single slice. A search only scores the chunks in the nprobe clusters whose centroids are most
+    similar to the query. Source filters are applied to those chunks, and more clusters are probed if too few chunks
+    from the allowed sources are found, so get_n_contexts keeps its leakage protection. The index is saved as .npy files,
+    which are memory-mapped on load.
+    """
+
+    def __init__(
+            self,
+            ids: List[str],
+            texts: List[str],
+            sources: List[str],
+            embeddings: np.ndarray,
+            centroids: np.ndarray,
+            list_offsets: np.ndarray,
+            nprobe: int = 8,
+            normalise: bool = True,
+        ) -> None:
+        """Initialises the IVFDocumentStoreWrapper class. Use build to create the index from embeddings, or load_index to
+        load a saved one.
+
+        Args:
+            ids (List[str]): The id of every chunk, in the order of their cluster.
+            texts (List[str]): The text of every chunk, in the order of their cluster.
+            sources (List[str]): The source of every chunk, in the order of their cluster.
+            embeddings (np.ndarray): Matrix with the embedding of every chunk as a row, in the order of their cluster.
+            centroids (np.ndarray): Matrix with the normalised centroid of every cluster as a row.
+            list_offsets (np.ndarray): The row of the first chunk of every cluster, followed by the number of chunks.
+            nprobe (int): The number of clusters searched for every query. Higher values raise recall at the cost of
+                latency (default: 8).
+            normalise (bool): Whether to normalise the embeddings (default: True).
+        """
+        super().__init__(ids, texts, sources, embeddings, normalise=normalise)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        if len(self.list_offsets) != len(self.centroids) + 1 or self.list_offsets[-1] != len(self.ids):
+            raise ValueError("list_offsets must hold the first row of every cluster followed by the number of chunks.")
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(
+            cls,
+            ids: List[str],
+            texts: List[str],
+            sources: List[str],
+            embeddings: np.ndarray,
+            num_lists: Optional[int] = None,
+            nprobe: int = 8,
+            num_iterations: int = 10,
+            training_points_per_list: int = 64,
+            max_workers: Optional[int] = None,
+            seed: int = 0,
+        ) -> "IVFDocumentStoreWrapper":
+        """Build the index by clustering the embeddings with spherical k-means on a sample of them, then assigning every
+        chunk to its nearest centroid. Both steps are spread across max_workers threads.
+
+        Args:
+            ids (List[str]): The id of every chunk.
+            texts (List[str]): The text of every chunk.
+            sources (List[str]): The source of every chunk.
+            embeddings (np.ndarray): Matrix with the embedding of every chunk as a row.
+            num_lists (int): The number of clusters. Defaults to the square root of the number of chunks.
+            nprobe (int): The number of clusters searched for every query (default: 8).
+            num_iterations (int): The number of k-means iterations (default: 10).
+            training_points_per_list (int): The size of the k-means sample, per cluster (default: 64).
+            max_workers (int): The number of threads used to build the index. Defaults to the number of cores.
+            seed (int): Seed for the k-means sample and initial centroids (default: 0).
+
+        Returns:
+            IVFDocumentStoreWrapper: The store with the index built.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        num_lists = min(num_lists or max(1, int(np.sqrt(len(embeddings)))), len(embeddings))
+        rng = np.random.default_rng(seed)
+        sample = embeddings[np.sort(rng.choice(
+            len(embeddings), size=min(len(embeddings), training_points_per_list * num_lists), replace=False
+        ))]
+        centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)]
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            for _ in range(num_iterations):
+                assignments = _nearest_centroids(sample, centroids, executor)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, sample)
+                empty = np.bincount(assignments, minlength=num_lists) == 0
+                # Empty clusters are restarted at random training points
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+                centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            assignments = _nearest_centroids(embeddings, centroids, executor)
+        order = np.argsort(assignments, kind='stable')
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=num_lists))))
+        return cls(
+            ids=np.asarray(ids, dtype=object)[order],
+            texts=np.asarray(texts, dtype=object)[order],
+            sources=np.asarray(sources, dtype=object)[order],
+            embeddings=embeddings[order],
+            centroids=centroids,
+            list_offsets=list_offsets,
+            nprobe=nprobe,
+            normalise=False,
+        )
+
+    def save_index(self, directory: str) -> None:
+        """Save the index to a directory, as a Parquet table of chunks and .npy files of embeddings, centroids and
+        cluster offsets.
+
+        Args:
+            directory (str): The directory to save the index to.
+        """
+        self.save(os.path.join(directory, "chunks.parquet"), os.path.join(directory, "embeddings.npy"))
+        np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "list_offsets.npy"), self.list_offsets)
+
+    @classmethod
+    def load_index(cls, directory: str, nprobe: int = 8, mmap: bool = True) -> "IVFDocumentStoreWrapper":
+        """Load an index saved with save_index.
+
+        Args:
+            directory (str): The directory the index was saved to.
+            nprobe (int): The number of clusters searched for every query (default: 8).
+            mmap (bool): Whether to memory-map the embeddings rather than read them into memory, so that only the
+                clusters searched are read from disk, and several processes share the same pages (default: True).
+
+        Returns:
+            IVFDocumentStoreWrapper: The store with the index loaded.
+        """
+        table = pd.read_parquet(os.path.join(directory, "chunks.parquet"))
+        return cls(
+            ids=table["id"].tolist(),
+            texts=table["text"].tolist(),
+            sources=table["source"].tolist(),
+            embeddings=np.load(os.path.join(directory, "embeddings.npy"), mmap_mode='r' if mmap else None),
+            centroids=np.load(os.path.join(directory, "centroids.npy")),
+            list_offsets=np.load(os.path.join(directory, "list_offsets.npy")),
+            nprobe=nprobe,
+            normalise=False,
+        )
+
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]],
+            nprobe: Optional[int] = None,
+        ) -> List[List[Document]]:
+        """Retrieve the top_k chunks most similar to each of many embeddings, from the clusters nearest to each.
+
+        Args:
+            chunk_embeddings (List[List[float]]): The embeddings to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve for each embedding.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+            nprobe (int): The number of clusters searched for every embedding. Defaults to the nprobe of the store.
+
+        Returns:
+            List[List[Document]]: The similar chunks of every embedding, most similar first, with their embeddings and
+                scores.
+        """
+        queries = np.asarray(chunk_embeddings, dtype=np.float32).reshape(len(chunk_embeddings), -1)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        mask = self._source_mask(sources)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe_orders = np.argsort(-(queries @ self.centroids.T), axis=1)
+        results = []
+        for query, probe_order in zip(queries, probe_orders):
+            probes = nprobe
+            while True:
+                rows = np.concatenate([
+                    np.arange(self.list_offsets[cluster], self.list_offsets[cluster + 1]) for cluster in probe_order[:probes]
+                ])
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                if len(rows) >= top_k or probes >= len(probe_order):
+                    break
+                # Too few chunks from the allowed sources in the clusters searched, so twice as many are searched
+                probes *= 2
+            k = min(top_k, len(rows))
+            if k <= 0:
+                results.append([])
+                continue
+            scores = np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            results.append([self._to_document(rows[i], float(scores[i])) for i in top])
+        return results
+
+#######################################################
+# Collection Snapshots - SnapshotDocumentStoreWrapper #
+#######################################################
+
+class SnapshotDocumentStoreWrapper(NumpyDocumentStoreWrapper):
+    """Document store served from a local snapshot of a collection, written once with export. Embeddings are stored
+    normalised in a float32 or float16 .npy file, and ids and texts as UTF-8 bytes with an index of the offset of every
+    chunk. Chunks are stored source by source, with the offset of every source. Embeddings and texts are memory-mapped,
+    so texts are only read from disk when a chunk is returned, and several processes reading the same snapshot share the
+    operating system's page cache rather than each querying the database.
+    """
+
+    def __init__(self, directory: str, max_cached_masks: int = 8) -> None:
+        """Initialises the SnapshotDocumentStoreWrapper class.
+
+        Args:
+            directory (str): The directory the snapshot was exported to.
+            max_cached_masks (int): The number of source filters kept in memory (default: 8).
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "snapshot.json"), 'r') as f:
+            self.metadata = json.load(f)
+        self.embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode='r')
+        self.text_bytes = self._map_bytes(os.path.join(directory, "texts.bin"))
+        self.text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode='r')
+        # Ids are decoded up front, as every lookup of a chunk by id needs them
+        id_bytes = self._map_bytes(os.path.join(directory, "ids.bin"))
+        id_offsets = np.load(os.path.join(directory, "id_offsets.npy"))
+        self.ids = np.asarray([
+            id_bytes[start:end].tobytes().decode('utf-8') for start, end in zip(id_offsets[:-1], id_offsets[1:])
+        ], dtype=object)
+        self.source_names = np.asarray(self.metadata["sources"], dtype=object)
+        self.source_index = np.repeat(
+            np.arange(len(self.source_names), dtype=np.int32), np.diff(self.metadata["source_offsets"])
+        )
+        self.max_cached_masks = max_cached_masks
+        self._index_rows()
+
+    @staticmethod
+    def _map_bytes(path: str) -> np.ndarray:
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
+
+    @classmethod
+    def export(
+            cls,
+            document_store_wrapper: DocumentStoreWrapper,
+            directory: str,
+            dtype: str = "float32",
+            batch_size: int = 1000,
+        ) -> "SnapshotDocumentStoreWrapper":
+        """Stream every chunk of a document store, for eg. a MilvusDocumentStoreWrapper, into a snapshot. Chunks are read
+        source by source and a page at a time with iter_chunks_from_sources, and their embeddings are fetched with
+        get_chunk_embeddings, so the collection is never held in memory.
+
+        Args:
+            document_store_wrapper (DocumentStoreWrapper): The document store to export.
+            directory (str): The directory to export the snapshot to.
+            dtype (str): The type embeddings are stored as, "float32" or "float16" to halve the size of the snapshot
+                (default: "float32").
+            batch_size (int): The number of chunks read from the document store at once (default: 1000).
+
+        Returns:
+            SnapshotDocumentStoreWrapper: The store served from the snapshot.
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be 'float32' or 'float16'.")
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        source_counts = document_store_wrapper.get_source_counts()
+        sources = sorted(source_counts)
+        num_chunks = sum(source_counts.values())
+        embeddings = None
+        id_offsets, text_offsets, source_offsets = [0], [0], [0]
+        with open(os.path.join(directory, "ids.bin"), 'wb') as id_file, \
+                open(os.path.join(directory, "texts.bin"), 'wb') as text_file, \
+                tqdm(total=num_chunks, desc="Exporting Snapshot") as pbar:
+            for source in sources:
+                for page in document_store_wrapper.iter_chunks_from_sources([source], batch_size):
+                    row = len(id_offsets) - 1
+                    if row + len(page) > num_chunks:
+                        raise ValueError("The document store changed during the export, please export it again.")
+                    page_embeddings = np.asarray(document_store_wrapper.get_chunk_embeddings(page), dtype=np.float32)
+                    page_embeddings = page_embeddings / np.maximum(
+                        np.linalg.norm(page_embeddings, axis=1, keepdims=True), 1e-12
+                    )
+                    if embeddings is None:
+                        embeddings = np.lib.format.open_memmap(
+                            os.path.join(directory, "embeddings.npy"),
+                            mode='w+',
+                            dtype=dtype,
+                            shape=(num_chunks, page_embeddings.shape[1]),
+                        )
+                    embeddings[row:row + len(page)] = page_embeddings
+                    for chunk_id, text in page:
+                        id_offsets.append(id_offsets[-1] + id_file.write(str(chunk_id).encode('utf-8')))
+                        text_offsets.append(text_offsets[-1] + text_file.write(text.encode('utf-8')))
+                    pbar.update(len(page))
+                source_offsets.append(len(id_offsets) - 1)
+        if source_offsets[-1] != num_chunks:
+            raise ValueError("The document store changed during the export, please export it again.")
+        if embeddings is None:
+            raise ValueError("The document store is empty.")
+        embeddings.flush()
+        del embeddings
+        np.save(os.path.join(directory, "id_offsets.npy"), np.asarray(id_offsets, dtype=np.int64))
+        np.save(os.path.join(directory, "text_offsets.npy"), np.asarray(text_offsets, dtype=np.int64))
+        with open(os.path.join(directory, "snapshot.json"), 'w') as f:
+            json.dump({
+                "num_chunks": num_chunks,
+                "dtype": dtype,
+                "sources": sources,
+                "source_offsets": source_offsets,
+            }, f)
+        return cls(directory)
+
+    def _chunks(self, rows: np.ndarray) -> List[Tuple[str, str]]:
+        return [
+            (
+                self.ids[row],
+                self.text_bytes[self.text_offsets[row]:self.text_offsets[row + 1]].tobytes().decode('utf-8'),
+            )
+            for row in rows
+        ]
+
+    def get_chunk_embedding(self, chunk: Tuple[str, str]) -> List[float]:
+        """Get the embedding of a chunk.
+
+        Args:
+            chunk (Tuple[str, str]): The chunk to get the embedding of. Chunk comes in the form of (id, chunk).
+
+        Returns:
+            List[float]: The normalised embedding of the chunk.
+        """
+        return self.embeddings[self.rows[chunk[0]]].astype(np.float32).tolist()
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]]) -> List[List[float]]:
+        """Get the embeddings of many chunks at once.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to get the embeddings of, in the form of (id, chunk).
+
+        Returns:
+            List[List[float]]: The normalised embedding of every chunk, in the same order as the chunks.
+        """
+        return self.embeddings[[self.rows[chunk[0]] for chunk in chunks]].astype(np.float32).tolist()
+
+######################################################
+# Embedding Cache Layer - CachedDocumentStoreWrapper #
+######################################################
+
+class CachedDocumentStoreWrapper(DocumentStoreWrapper):
+    """Layer over any document store wrapper that keeps the embeddings of every chunk it has seen in a compressed
+    EmbeddingCache. Embeddings of seeds are fetched from the document store only once, and the embeddings of neighbours
+    are cached as they are retrieved. get_n_contexts then checks neighbours against the similarity threshold with
+    similarities computed on the compressed embeddings. Every other call is passed through to the document store.
+    """
+
+    def __init__(self, document_store_wrapper: DocumentStoreWrapper, embedding_cache: Optional[EmbeddingCache] = None):
+        """Initialises the CachedDocumentStoreWrapper class.
+
+        Args:
+            document_store_wrapper (DocumentStoreWrapper): The document store to cache the embeddings of.
+            embedding_cache (EmbeddingCache): The cache to keep embeddings in. Defaults to an int8 cache kept in memory.
+        """
+        self.document_store_wrapper = document_store_wrapper
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        # The cache grows in place, so it is only read and written by one thread at a time
+        self.lock = threading.Lock()
+
+    def get_all_sources(self) -> List[str]:
+        return self.document_store_wrapper.get_all_sources()
+
+    def get_source_counts(self) -> Dict[str, int]:
+        return self.document_store_wrapper.get_source_counts()
+
+    def get_chunks_from_sources(self, sources: List[str]) -> List[Tuple[str, str]]:
+        return self.document_store_wrapper.get_chunks_from_sources(sources)
+
+    def iter_chunks_from_sources(self, sources: List[str], batch_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        return self.document_store_wrapper.iter_chunks_from_sources(sources, batch_size)
+
+    def get_chunk_embedding(self, chunk: Tuple[str, str]) -> List[float]:
+        return self.get_chunk_embeddings([chunk])[0]
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]]) -> List[List[float]]:
+        """Get the embeddings of many chunks, fetching only the chunks missing from the cache from the document store.
+
+        Args:
+            chunks (List[Tuple[str, str]]): The chunks to get the embeddings of, in the form of (id, chunk).
+
+        Returns:
+            List[List[float]]: The normalised embedding of every chunk, in the same order as the chunks, as stored in the
+                cache.
+        """
+        with self.lock:
+            rows = self.embedding_cache.lookup([chunk[0] for chunk in chunks])
+        missing = [chunk for chunk, row in zip(chunks, rows) if row < 0]
+        embeddings = self.document_store_wrapper.get_chunk_embeddings(missing) if missing else []
+        with self.lock:
+            if missing:
+                self.embedding_cache.add([chunk[0] for chunk in missing], embeddings)
+            return self.embedding_cache.get([chunk[0] for chunk in chunks]).tolist()
+
+    def retrieve_similar_chunks(
+            self,
+            chunk_embedding: List[float],
+            top_k: int,
+            sources: Optional[List[str]]
+        ) -> List[Any]:
+        return self.retrieve_similar_chunks_batch([chunk_embedding], top_k, sources)[0]
+
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]]
+        ) -> List[List[Any]]:
+        """Retrieve the top_k similar chunks for many embeddings from the document store, caching the embedding of every
+        chunk retrieved.
+
+        Args:
+            chunk_embeddings (List[List[float]]): The embeddings to retrieve similar chunks for.
+            top_k (int): The number of similar chunks to retrieve for each embedding.
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+
+        Returns:
+            List[List[Any]]: The similar chunks of every embedding, in the same order as the embeddings.
+        """
+        neighbours = self.document_store_wrapper.retrieve_similar_chunks_batch(chunk_embeddings, top_k, sources)
+        retrieved = [
+            chunk for similar_chunks in neighbours for chunk in similar_chunks if chunk.embedding is not None
+        ]
+        if retrieved:
+            with self.lock:
+                self.embedding_cache.add([chunk.id for chunk in retrieved], [chunk.embedding for chunk in retrieved])
+        return neighbours
+
+    def neighbour_similarities(
+            self,
+            seeds: List[Tuple[str, str]],
+            seed_embeddings: List[List[float]],
+            neighbours: List[List[Any]],
+        ) -> np.ndarray:
+        """Compute the cosine similarity of every neighbour to its seed on the compressed embeddings in the cache. Falls
+        back to the embeddings provided if any seed or neighbour is not cached.
+
+        Args:
+            seeds (List[Tuple[str, str]]): The seed chunks, in the form of (id, chunk).
+            seed_embeddings (List[List[float]]): The embedding of every seed.
+            neighbours (List[List[Any]]): The similar chunks of every seed.
+
+        Returns:
+            np.ndarray: The similarity of every neighbour to its seed, in the order of the seeds and their neighbours.
+        """
+        seed_ids = [seed[0] for seed, similar_chunks in zip(seeds, neighbours) for _ in similar_chunks]
+        neighbour_ids = [chunk.id for similar_chunks in neighbours for chunk in similar_chunks]
+        with self.lock:
+            if all(chunk_id in self.embedding_cache for chunk_id in seed_ids + neighbour_ids):
+                return self.embedding_cache.similarities(seed_ids, neighbour_ids)
+        return super().neighbour_similarities(seeds, seed_embeddings, neighbours)
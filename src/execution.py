@@ -0,0 +1,383 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+
+# Libs
+from haystack.components.generators import AzureOpenAIGenerator
+from tqdm import tqdm
+
+# Custom
+from .caching import ResponseCache
+from .metrics import RunMetrics
+
+###############################
+# Rate Limiting - RateLimiter #
+###############################
+
+class RateLimiter:
+    """Token-bucket scheduler that keeps requests to the language model within requests-per-minute and tokens-per-minute
+    budgets, such as those set on an Azure OpenAI deployment. The number of tokens a request uses is estimated from the
+    length of its prompt before it is sent. When the deployment throttles a request, every request waits for the backoff
+    delay and the sending rate is reduced, then recovers gradually as requests succeed again, so that throughput stays
+    close to the quota instead of swinging between bursts and failures. Time spent waiting on quota is recorded per
+    stage.
+    """
+
+    def __init__(
+            self,
+            requests_per_minute: Optional[float] = None,
+            tokens_per_minute: Optional[float] = None,
+            completion_tokens: int = 256,
+            burst_seconds: float = 10,
+        ) -> None:
+        """Initialises the RateLimiter class.
+
+        Args:
+            requests_per_minute (float): The maximum number of requests per minute. Not limited if not provided
+                (default: None).
+            tokens_per_minute (float): The maximum number of prompt and completion tokens per minute. Not limited if not
+                provided (default: None).
+            completion_tokens (int): The number of completion tokens assumed for each request, used when the model does
+                not set max_tokens in its generation_kwargs (default: 256).
+            burst_seconds (float): How many seconds worth of budget can be spent at once, which bounds the size of
+                bursts (default: 10).
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.completion_tokens = completion_tokens
+        self.burst_seconds = burst_seconds
+        self.request_bucket = self._capacity(requests_per_minute)
+        self.token_bucket = self._capacity(tokens_per_minute)
+        self.rate_scale = 1.0
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+        self.wait_times: Dict[str, float] = defaultdict(float)
+        self.throttled: Dict[str, int] = defaultdict(int)
+
+    def _capacity(self, per_minute: Optional[float]) -> float:
+        return per_minute * self.burst_seconds / 60 if per_minute else 0.0
+
+    @staticmethod
+    def estimate_tokens(prompt: str) -> int:
+        """Estimate the number of tokens in a prompt, assuming roughly four characters per token.
+
+        Args:
+            prompt (str): The prompt to estimate.
+
+        Returns:
+            int: The estimated number of tokens.
+        """
+        return len(prompt) // 4 + 1
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        if self.requests_per_minute:
+            self.request_bucket = min(
+                self._capacity(self.requests_per_minute),
+                self.request_bucket + elapsed * self.requests_per_minute * self.rate_scale / 60
+            )
+        if self.tokens_per_minute:
+            self.token_bucket = min(
+                self._capacity(self.tokens_per_minute),
+                self.token_bucket + elapsed * self.tokens_per_minute * self.rate_scale / 60
+            )
+
+    async def acquire(self, tokens: int, stage: str) -> None:
+        """Wait until the budgets allow a request using the given number of tokens, then spend them.
+
+        Args:
+            tokens (int): The estimated number of tokens the request will use.
+            stage (str): The stage the request belongs to, used to report time spent waiting.
+        """
+        if self.tokens_per_minute:
+            # A single request larger than the bucket would otherwise never be sent
+            tokens = min(tokens, self._capacity(self.tokens_per_minute))
+        start = time.monotonic()
+        while True:
+            self._refill()
+            now = time.monotonic()
+            delay = self.blocked_until - now
+            if delay <= 0:
+                request_deficit = 1 - self.request_bucket if self.requests_per_minute else 0
+                token_deficit = tokens - self.token_bucket if self.tokens_per_minute else 0
+                if request_deficit <= 0 and token_deficit <= 0:
+                    if self.requests_per_minute:
+                        self.request_bucket -= 1
+                    if self.tokens_per_minute:
+                        self.token_bucket -= tokens
+                    break
+                delay = max(
+                    request_deficit * 60 / (self.requests_per_minute * self.rate_scale) if request_deficit > 0 else 0,
+                    token_deficit * 60 / (self.tokens_per_minute * self.rate_scale) if token_deficit > 0 else 0,
+                )
+            await asyncio.sleep(delay)
+        self.wait_times[stage] += time.monotonic() - start
+
+    def throttle(self, delay: float, stage: str) -> None:
+        """Record that a request was throttled. Every request waits for the delay, and the sending rate is reduced.
+
+        Args:
+            delay (float): The number of seconds to hold off all requests for.
+            stage (str): The stage the throttled request belongs to.
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.rate_scale = max(0.1, self.rate_scale * 0.75)
+        self.throttled[stage] += 1
+
+    def success(self) -> None:
+        """Record that a request succeeded, gradually restoring the sending rate after throttling."""
+        self.rate_scale = min(1.0, self.rate_scale + 0.02)
+
+    def record_wait(self, stage: str, seconds: float) -> None:
+        """Add time spent waiting on quota outside of acquire, for eg. while backing off, to a stage.
+
+        Args:
+            stage (str): The stage that waited.
+            seconds (float): The number of seconds waited.
+        """
+        self.wait_times[stage] += seconds
+
+    def reset_stats(self) -> None:
+        """Reset the wait times and throttling counts, for eg. at the start of a new run."""
+        self.wait_times.clear()
+        self.throttled.clear()
+
+    def report(self) -> str:
+        """Summarise the time each stage spent waiting on quota since the counters were last reset.
+
+        Returns:
+            str: A report with one line per stage.
+        """
+        lines = ["Rate limiter wait times:"]
+        for stage in sorted(set(self.wait_times) | set(self.throttled)):
+            lines.append(
+                f"  {stage}: {self.wait_times[stage]:.1f}s waiting, {self.throttled[stage]} throttled requests"
+            )
+        if len(lines) == 1:
+            lines.append("  No requests were made.")
+        return "\n".join(lines)
+
+########################################
+# Model Execution - AsyncModelExecutor #
+########################################
+
+class AsyncModelExecutor:
+    """Runs prompts against a Haystack-compatible generator concurrently. Every stage of the DatasetGenerator submits its
+    prompts to this class instead of calling model.run directly, so that up to max_concurrency requests are in flight
+    at any one time. Replies are always returned in the same order as the prompts submitted, which keeps generation
+    deterministic for a given seed regardless of the order in which requests complete. If a ResponseCache is provided,
+    cached replies are returned without calling the model, and identical prompts within a batch are only sent once.
+    Requests that are throttled by the deployment are retried with exponential backoff and jitter, and a RateLimiter
+    can be provided to keep requests within the deployment's quota in the first place.
+    """
+
+    def __init__(
+            self,
+            model: AzureOpenAIGenerator,
+            max_concurrency: int = 8,
+            response_cache: Optional[ResponseCache] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            max_retries: int = 5,
+            metrics: Optional[RunMetrics] = None,
+        ) -> None:
+        """Initialises the AsyncModelExecutor class.
+
+        Args:
+            model (AzureOpenAIGenerator): The language model to run prompts against. Any generator with a run method
+                returning {"replies": [...]} can be used.
+            max_concurrency (int): The maximum number of prompts to run at the same time (default: 8).
+            response_cache (ResponseCache): Cache to look replies up in before calling the model (default: None).
+            rate_limiter (RateLimiter): Scheduler that keeps requests within requests-per-minute and tokens-per-minute
+                budgets (default: None).
+            max_retries (int): The number of times a throttled request is retried before giving up (default: 5).
+            metrics (RunMetrics): Records the token usage, latency and retries of every call (default: None).
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}.")
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.metrics = metrics
+        # Kept apart from the global random state, which DatasetGenerator seeds for reproducibility
+        self.jitter = random.Random()
+        self.model_identity = self._get_model_identity(model)
+        self.generation_params = getattr(model, 'generation_kwargs', None) or {}
+
+    def run(self, prompt: str, stage: str = "default") -> str:
+        """Run a single prompt and return the first reply.
+
+        Args:
+            prompt (str): The prompt to run.
+            stage (str): The generation stage the prompt belongs to, used for reporting (default: "default").
+
+        Returns:
+            str: The reply from the model.
+        """
+        return self.run_batch([prompt], stage=stage)[0]
+
+    def run_batch(
+            self,
+            prompts: List[str],
+            stage: str = "default",
+            desc: Optional[str] = None,
+            on_reply: Optional[Callable[[int, str], None]] = None,
+        ) -> List[str]:
+        """Run a list of prompts concurrently and return the first reply of each, in the order of the prompts.
+
+        Args:
+            prompts (List[str]): The prompts to run.
+            stage (str): The generation stage the prompts belong to, used for reporting (default: "default").
+            desc (str): Description for the progress bar. No progress bar is shown if not provided (default: None).
+            on_reply (Callable[[int, str], None]): Called with the index of every prompt and its reply as soon as the
+                reply arrives, in the order replies complete, for eg. to checkpoint them (default: None).
+
+        Returns:
+            List[str]: The replies from the model, where the i-th reply corresponds to the i-th prompt.
+        """
+        if not prompts:
+            return []
+        start = time.monotonic()
+        if self.response_cache is None:
+            replies = self._run_coroutine(self._run_all(prompts, stage, desc, on_reply))
+        else:
+            keys = [
+                self.response_cache.make_key(self.model_identity, prompt, self.generation_params) for prompt in prompts
+            ]
+            cached = self.response_cache.get_many(keys)
+            if self.metrics is not None:
+                self.metrics.record_cache_hits(stage, sum(1 for key in keys if key in cached))
+            positions = defaultdict(list)
+            for idx, key in enumerate(keys):
+                positions[key].append(idx)
+            if on_reply is not None:
+                for key in cached:
+                    for idx in positions[key]:
+                        on_reply(idx, cached[key])
+            # Identical prompts that missed the cache are only sent to the model once
+            pending = {key: prompt for key, prompt in zip(keys, prompts) if key not in cached}
+            if pending:
+                pending_keys = list(pending)
+
+                def on_pending_reply(position: int, reply: str) -> None:
+                    for idx in positions[pending_keys[position]]:
+                        on_reply(idx, reply)
+
+                new_replies = self._run_coroutine(self._run_all(
+                    list(pending.values()), stage, desc, on_pending_reply if on_reply is not None else None
+                ))
+                new_replies = dict(zip(pending, new_replies))
+                self.response_cache.put_many(new_replies)
+                cached.update(new_replies)
+            replies = [cached[key] for key in keys]
+        if self.metrics is not None:
+            self.metrics.record_stage_time(stage, time.monotonic() - start)
+        return replies
+
+    async def _run_all(
+            self,
+            prompts: List[str],
+            stage: str,
+            desc: Optional[str],
+            on_reply: Optional[Callable[[int, str], None]] = None,
+        ) -> List[str]:
+        replies = [None] * len(prompts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool, \
+                tqdm(total=len(prompts), desc=desc, disable=desc is None) as pbar:
+
+            async def worker(idx: int, prompt: str) -> None:
+                async with semaphore:
+                    replies[idx] = await self._call_with_retries(pool, prompt, stage)
+                if on_reply is not None:
+                    on_reply(idx, replies[idx])
+                pbar.update(1)
+
+            await asyncio.gather(*(worker(idx, prompt) for idx, prompt in enumerate(prompts)))
+        return replies
+
+    async def _call_with_retries(self, pool: ThreadPoolExecutor, prompt: str, stage: str) -> str:
+        loop = asyncio.get_running_loop()
+        tokens = RateLimiter.estimate_tokens(prompt)
+        if self.rate_limiter is not None:
+            tokens += self.generation_params.get('max_tokens', self.rate_limiter.completion_tokens)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(tokens, stage)
+            # Latency only covers the model call, as quota waits and backoff are reported by the rate limiter
+            start = time.monotonic()
+            try:
+                reply, usage = await loop.run_in_executor(pool, self._call_model, prompt)
+            except Exception as e:
+                if not self._is_throttling_error(e) or attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.throttle(delay, stage)
+                    self.rate_limiter.record_wait(stage, delay)
+                await asyncio.sleep(delay)
+                continue
+            if self.rate_limiter is not None:
+                self.rate_limiter.success()
+            if self.metrics is not None:
+                self.metrics.record_call(
+                    stage,
+                    prompt_tokens=usage.get('prompt_tokens') or RateLimiter.estimate_tokens(prompt),
+                    completion_tokens=usage.get('completion_tokens') or RateLimiter.estimate_tokens(reply),
+                    latency=time.monotonic() - start,
+                    retries=attempt,
+                )
+            return reply
+
+    def _call_model(self, prompt: str) -> Tuple[str, Dict]:
+        result = self.model.run(prompt)
+        # OpenAI-based generators report token usage in the meta of each reply
+        meta = result.get('meta') or [{}]
+        return result['replies'][0], meta[0].get('usage') or {}
+
+    @staticmethod
+    def _is_throttling_error(error: Exception) -> bool:
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None:
+            status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status_code == 429 or 'RateLimit' in type(error).__name__
+
+    def _backoff_delay(self, attempt: int, error: Exception, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            retry_after = float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+        # Full jitter spreads retries out, so that throttled requests do not all retry at the same moment
+        delay = self.jitter.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    @staticmethod
+    def _get_model_identity(model: AzureOpenAIGenerator) -> str:
+        identity: Dict[str, Any] = {"type": f"{type(model).__module__}.{type(model).__qualname__}"}
+        for attribute in ("model", "azure_deployment", "system_prompt"):
+            if getattr(model, attribute, None) is not None:
+                identity[attribute] = getattr(model, attribute)
+        return json.dumps(identity, sort_keys=True, default=str)
+
+    @staticmethod
+    def _run_coroutine(coroutine: Coroutine) -> Any:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Already inside an event loop (eg. Jupyter notebooks), so run the coroutine on its own loop in another thread
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coroutine).result()
@@ -0,0 +1,362 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Libs
+import numpy as np
+from haystack import Document
+
+# Custom
+from .document_stores import NumpyDocumentStoreWrapper
+
+################################
+# Fake Errors - FakeModelError #
+################################
+
+class FakeModelError(RuntimeError):
+    """Raised by FakeGenerator to simulate a request that failed on the model's side."""
+
+class FakeRateLimitError(FakeModelError):
+    """Raised by FakeGenerator to simulate a request throttled by the deployment. Carries a 429 status code, so it is
+    retried by AsyncModelExecutor in the same way as a throttled Azure OpenAI request."""
+    status_code = 429
+
+#######################################
+# Fake Language Model - FakeGenerator #
+#######################################
+
+# Phrase in the first rule of each evolution template in utils.py, and the prefix added to queries evolved with it
+_EVOLUTION_PREFIXES = [
+    ("all elements of `Context`", "Drawing on every part of the context,"),
+    ("thinking processes", "Reasoning step by step,"),
+    ("more specific", "Specifically,"),
+    ("general concepts", "In general,"),
+    ("constraints", "Under the stated constraints,"),
+    ("comparing", "Compared with related ideas,"),
+    ("hypothetical", "Hypothetically,"),
+    ("brand new", "In a related area,"),
+]
+
+def _stable_fraction(text: str, salt: str = "") -> float:
+    """Map a string to a number in [0, 1) that does not change between runs or processes."""
+    digest = hashlib.sha1(f"{salt}:{text}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+class FakeGenerator:
+    """Scripted stand-in for a Haystack generator, for running and benchmarking the pipeline without network access.
+    The template used to build each prompt is recognised from its wording, and a valid reply for that template is
+    returned: chunk verdicts, queries, separated queries, evolved queries and answers. Replies only depend on the prompt,
+    so a run gives the same dataset at any level of concurrency. Latency, failures and throttling can be simulated, and
+    replies can be recorded to or replayed from a JSONL file of real model replies.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            latency_jitter: float = 0.0,
+            failure_rate: float = 0.0,
+            throttle_rate: float = 0.0,
+            accept_rate: float = 0.8,
+            compound_query_rate: float = 0.2,
+            replay_path: Optional[str] = None,
+            seed: int = 0,
+        ) -> None:
+        """Initialises the FakeGenerator class.
+
+        Args:
+            latency (float): The number of seconds every call takes (default: 0.0).
+            latency_jitter (float): Up to this many seconds are added at random to the latency of every call
+                (default: 0.0).
+            failure_rate (float): The share of calls that raise FakeModelError (default: 0.0).
+            throttle_rate (float): The share of calls that raise FakeRateLimitError, which are retried by the executor
+                (default: 0.0).
+            accept_rate (float): The share of chunks judged self-contained and not metadata (default: 0.8).
+            compound_query_rate (float): The share of multi-context queries made up of two questions, which are then
+                split by separate_query (default: 0.2).
+            replay_path (str): JSONL file of {"prompt": ..., "reply": ...} records. Prompts found in the file are
+                answered with the recorded reply instead of a scripted one (default: None).
+            seed (int): Seed for the simulated latency, failures and throttling (default: 0).
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.accept_rate = accept_rate
+        self.compound_query_rate = compound_query_rate
+        # Generator attributes read by AsyncModelExecutor to identify the model in the response cache
+        self.model = "fake"
+        self.generation_kwargs: Dict = {}
+        self.replies: Dict[str, str] = {}
+        if replay_path and os.path.exists(replay_path):
+            with open(replay_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.replies[record["prompt"]] = record["reply"]
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+
+    def run(self, prompt: str) -> Dict:
+        """Reply to a prompt in the same format as a Haystack generator.
+
+        Args:
+            prompt (str): The prompt to reply to.
+
+        Returns:
+            Dict: {"replies": [reply], "meta": [{"usage": {...}}]}.
+        """
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.latency_jitter)
+            outcome = self.rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if outcome < self.throttle_rate:
+            raise FakeRateLimitError("Simulated rate limit.")
+        if outcome < self.throttle_rate + self.failure_rate:
+            raise FakeModelError("Simulated model failure.")
+        kind = self.prompt_kind(prompt)
+        with self.lock:
+            self.calls[kind] += 1
+        reply = self.replies.get(prompt)
+        if reply is None:
+            reply = getattr(self, f"_reply_{kind}")(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(reply) // 4 + 1}
+        return {"replies": [reply], "meta": [{"usage": usage}]}
+
+    def save_replay(self, path: str, prompts: List[str]) -> None:
+        """Append the replies to a list of prompts to a JSONL file that can be passed as replay_path.
+
+        Args:
+            path (str): The JSONL file to append to.
+            prompts (List[str]): The prompts to record.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'a') as f:
+            for prompt in prompts:
+                reply = self.replies.get(prompt) or getattr(self, f"_reply_{self.prompt_kind(prompt)}")(prompt)
+                f.write(json.dumps({"prompt": prompt, "reply": reply}) + "\n")
+
+    @staticmethod
+    def prompt_kind(prompt: str) -> str:
+        """Recognise the template in utils.py that a prompt was built from.
+
+        Args:
+            prompt (str): The prompt to recognise.
+
+        Returns:
+            str: One of "evaluate_chunks_batch", "evaluate_chunk", "context_query", "chunk_query", "separate_query",
+                "answer_query" or "evolve_query".
+        """
+        if prompt.startswith("Given a numbered list of chunks"):
+            return "evaluate_chunks_batch"
+        if prompt.startswith("Given a chunk"):
+            return "evaluate_chunk"
+        if prompt.startswith("You are a curious student"):
+            return "context_query" if "SEPARATOR" in prompt else "chunk_query"
+        if prompt.startswith("You will be given a query that contains two questions"):
+            return "separate_query"
+        if prompt.startswith("You will be given a query and chunks"):
+            return "answer_query"
+        if prompt.startswith("I want you to act as an input rewriter"):
+            return "evolve_query"
+        raise ValueError("Prompt does not match any template in utils.py.")
+
+    def _verdict(self, chunk: str) -> Dict[str, int]:
+        accepted = _stable_fraction(chunk.strip(), "verdict") < self.accept_rate
+        # Rejected chunks are split between the two criteria, as a real model would reject them for either reason
+        metadata = not accepted and _stable_fraction(chunk.strip(), "criterion") < 0.5
+        return {"self_containment": int(accepted or metadata), "not_metadata": int(not metadata)}
+
+    @staticmethod
+    def _topic(text: str, words: int = 4) -> str:
+        return " ".join(re.findall(r"\w+", text)[:words]) or "this topic"
+
+    def _reply_evaluate_chunk(self, prompt: str) -> str:
+        chunk = prompt.rsplit("Chunk:\n", 1)[-1].rsplit("\n\n    Output:", 1)[0]
+        return json.dumps(self._verdict(chunk))
+
+    def _reply_evaluate_chunks_batch(self, prompt: str) -> str:
+        section = prompt.rsplit("Chunks:\n", 1)[-1].rsplit("\n\n    Output:", 1)[0]
+        chunks = re.split(r"\n\n    Chunk \d+: ", section.strip()[len("Chunk 1: "):])
+        return json.dumps([{"id": i + 1, **self._verdict(chunk)} for i, chunk in enumerate(chunks)])
+
+    def _reply_chunk_query(self, prompt: str) -> str:
+        chunk = prompt.rsplit("Chunk:\n", 1)[-1]
+        return f"What does the text say about {self._topic(chunk)}?"
+
+    def _reply_context_query(self, prompt: str) -> str:
+        chunks = prompt.rsplit("Context:\n", 1)[-1].split("SEPARATOR")
+        query = f"How does {self._topic(chunks[0])} relate to {self._topic(chunks[-1])}?"
+        if _stable_fraction(prompt, "compound") < self.compound_query_rate:
+            query = f"How does {self._topic(chunks[0])} work, and what is the role of {self._topic(chunks[-1])}?"
+        # Multi-context queries are parsed with json.loads, so they are returned as a JSON string
+        return json.dumps(query)
+
+    def _reply_separate_query(self, prompt: str) -> str:
+        query, chunk_strings = prompt.rsplit("Query: ", 1)[-1].split("\n", 1)
+        num_chunks = len(re.findall(r"(?m)^\s*Chunk \d+: ", chunk_strings))
+        first, _, second = query.partition(", and ")
+        # Both questions keep more than one chunk, so that separate_query keeps them
+        return json.dumps({
+            f"{first.rstrip('?')}?": list(range(1, max(num_chunks, 2))),
+            f"{second[:1].upper()}{second[1:]}": list(range(2, max(num_chunks, 2) + 1)),
+        })
+
+    def _reply_answer_query(self, prompt: str) -> str:
+        query, chunk_strings = prompt.rsplit("Query: ", 1)[-1].split("\n", 1)
+        chunks = re.split(r"(?m)^\s*Chunk \d+: ", chunk_strings)[1:]
+        points = " ".join(f"Chunk {i + 1} covers {self._topic(chunk)}." for i, chunk in enumerate(chunks))
+        return f"In answer to {query.strip()!r}: {points}"
+
+    def _reply_evolve_query(self, prompt: str) -> str:
+        match = re.search(r"\n\s*Input:\n\s*(.*?)\n\s*(?:Context|Rewritten Input):", prompt[-4000:], re.S)
+        query = match.group(1).strip() if match else "the question"
+        rule = prompt.split("1. ", 1)[-1].split("\n", 1)[0]
+        prefix = next((prefix for phrase, prefix in _EVOLUTION_PREFIXES if phrase in rule), "In other words,")
+        return f"{prefix} {query[:1].lower()}{query[1:]}"
+
+##################################################
+# Fake Document Store - FakeDocumentStoreWrapper #
+##################################################
+
+class FakeDocumentStoreWrapper(NumpyDocumentStoreWrapper):
+    """In-process document store for running and benchmarking the pipeline without a Milvus server. Builds on the
+    in-memory NumpyDocumentStoreWrapper, adding from_synthetic to build a corpus of any size, where chunks from the same
+    document share a topic, so that get_n_contexts finds neighbours above the similarity threshold. A latency can be
+    simulated for every call.
+    """
+
+    def __init__(
+            self,
+            ids: List[str],
+            texts: List[str],
+            sources: List[str],
+            embeddings: np.ndarray,
+            latency: float = 0.0,
+        ) -> None:
+        """Initialises the FakeDocumentStoreWrapper class.
+
+        Args:
+            ids (List[str]): The id of every chunk.
+            texts (List[str]): The text of every chunk.
+            sources (List[str]): The source of every chunk.
+            embeddings (np.ndarray): Matrix with the embedding of every chunk as a row.
+            latency (float): The number of seconds every call to the document store takes (default: 0.0).
+        """
+        super().__init__(ids, texts, sources, embeddings)
+        self.latency = latency
+
+    @classmethod
+    def from_synthetic(
+            cls,
+            num_chunks: int = 1000,
+            num_sources: int = 50,
+            num_topics: int = 20,
+            embedding_dim: int = 64,
+            metadata_rate: float = 0.05,
+            seed: int = 0,
+            latency: float = 0.0,
+        ) -> "FakeDocumentStoreWrapper":
+        """Build a store with a synthetic corpus. Every source is a document about one topic, and its chunks are made of
+        words from that topic's vocabulary with embeddings close to the topic's centroid. Chunk lengths vary, so some
+        fall under the chunk size threshold, and a share of chunks look like reference lists.
+
+        Args:
+            num_chunks (int): The number of chunks (default: 1000).
+            num_sources (int): The number of sources the chunks are spread over (default: 50).
+            num_topics (int): The number of topics (default: 20).
+            embedding_dim (int): The size of the embeddings (default: 64).
+            metadata_rate (float): The share of chunks that look like reference lists (default: 0.05).
+            seed (int): Seed for the corpus (default: 0).
+            latency (float): The number of seconds every call to the document store takes (default: 0.0).
+
+        Returns:
+            FakeDocumentStoreWrapper: The store with the synthetic corpus.
+        """
+        rng = np.random.default_rng(seed)
+        letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+        vocabulary = np.array([
+            "".join(word) for word in letters[rng.integers(0, 26, size=(num_topics * 100, 8))]
+        ])
+        topic_words = vocabulary.reshape(num_topics, 100)
+        centroids = rng.normal(size=(num_topics, embedding_dim))
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+
+        source_of_chunk = np.sort(rng.integers(0, num_sources, size=num_chunks))
+        topic_of_chunk = source_of_chunk % num_topics
+        num_words = rng.integers(15, 100, size=num_chunks)
+        is_metadata = rng.random(num_chunks) < metadata_rate
+        word_choices = rng.integers(0, 100, size=(num_chunks, 100), dtype=np.uint8)
+        texts = []
+        for i in range(num_chunks):
+            if is_metadata[i]:
+                year = 1990 + i % 30
+                texts.append(" ".join(
+                    f"[{j}] Retrieved {year}-0{j % 9 + 1}-1{j % 9}. (https://example.org/{i}/{j})" for j in range(8)
+                ))
+                continue
+            words = topic_words[topic_of_chunk[i], word_choices[i, :num_words[i]]].tolist()
+            sentences = [" ".join(words[j:j + 10]) for j in range(0, len(words), 10)]
+            texts.append(". ".join(sentence.capitalize() for sentence in sentences) + ".")
+        embeddings = centroids[topic_of_chunk].astype(np.float32)
+        embeddings += 0.08 * rng.standard_normal(size=(num_chunks, embedding_dim), dtype=np.float32)
+        return cls(
+            ids=[f"chunk-{i}" for i in range(num_chunks)],
+            texts=texts,
+            sources=[f"source-{s}.pdf" for s in source_of_chunk],
+            embeddings=embeddings,
+            latency=latency,
+        )
+
+    def _wait(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def get_all_sources(self) -> List[str]:
+        self._wait()
+        return super().get_all_sources()
+
+    def get_source_counts(self) -> Dict[str, int]:
+        self._wait()
+        return super().get_source_counts()
+
+    def get_chunks_from_sources(self, sources: List[str]) -> List[Tuple[str, str]]:
+        self._wait()
+        return super().get_chunks_from_sources(sources)
+
+    def iter_chunks_from_sources(self, sources: List[str], batch_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        for page in super().iter_chunks_from_sources(sources, batch_size):
+            self._wait()
+            yield page
+
+    def get_chunk_embedding(self, chunk: Tuple[str, str]) -> List[float]:
+        self._wait()
+        return super().get_chunk_embedding(chunk)
+
+    def get_chunk_embeddings(self, chunks: List[Tuple[str, str]]) -> List[List[float]]:
+        self._wait()
+        return super().get_chunk_embeddings(chunks)
+
+    def retrieve_similar_chunks_batch(
+            self,
+            chunk_embeddings: List[List[float]],
+            top_k: int,
+            sources: Optional[List[str]],
+            batch_size: int = 64,
+        ) -> List[List[Document]]:
+        self._wait()
+        return super().retrieve_similar_chunks_batch(chunk_embeddings, top_k, sources, batch_size)
@@ -0,0 +1,103 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+##########################################
+# Checkpoint Journal - CheckpointJournal #
+##########################################
+
+class CheckpointJournal:
+    """Append-only journal of the items every generation stage has finished, kept as a JSONL file next to the dataset.
+    Every record is one line holding its stage, a key and a value, and is flushed as soon as it is written, so a crash
+    only loses the items still in flight instead of the whole stage. Writing a record takes the same time however large
+    the dataset is, unlike saving the dataset, which rewrites it whole. Loading the journal lets a resumed run skip
+    every item that is already done.
+    """
+
+    def __init__(self, path: str, resume: bool = True) -> None:
+        """Initialises the CheckpointJournal class. Records already in the journal at path are loaded.
+
+        Args:
+            path (str): The JSONL file to load records from and append records to.
+            resume (bool): Whether to keep the records already in the journal. The journal is emptied if False
+                (default: True).
+        """
+        self.path = path
+        self.records: Dict[Tuple[str, str], Any] = {}
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Only the last line can be torn, by a crash while it was being written
+                        continue
+                    self.records[(record["stage"], record["key"])] = record["value"]
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                torn = f.tell() > 0 and f.seek(-1, os.SEEK_END) >= 0 and f.read(1) != b"\n"
+            self.file = open(path, 'a', encoding='utf-8')
+            if torn:
+                # Start on a new line, so that the next record is not appended to the torn one
+                self.file.write("\n")
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, stage_key: Tuple[str, str]) -> bool:
+        return stage_key in self.records
+
+    @staticmethod
+    def make_key(prompt: str) -> str:
+        """Build the key of an item from the prompt that produced it, which stays the same when a run is resumed.
+
+        Args:
+            prompt (str): The prompt of the item.
+
+        Returns:
+            str: A hash of the prompt.
+        """
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """Get the value recorded for an item.
+
+        Args:
+            stage (str): The stage the item belongs to.
+            key (str): The key of the item.
+
+        Returns:
+            Any: The value recorded, or None if the item is not done.
+        """
+        return self.records.get((stage, key))
+
+    def record(self, stage: str, key: str, value: Any) -> None:
+        """Append a finished item to the journal.
+
+        Args:
+            stage (str): The stage the item belongs to.
+            key (str): The key of the item.
+            value (Any): The JSON-serialisable result of the item.
+        """
+        line = json.dumps({"stage": stage, "key": key, "value": value})
+        with self.lock:
+            self.records[(stage, key)] = value
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        """Close the journal file."""
+        self.file.close()
@@ -0,0 +1,168 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# Libs
+import numpy as np
+from tqdm import tqdm
+
+# Custom
+if TYPE_CHECKING:
+    from .dataset_generation import DocumentStoreWrapper
+
+######################################
+# Nearest Neighbour Graph - KNNGraph #
+######################################
+
+class KNNGraph:
+    """Graph linking every eligible chunk to its k most similar chunks, for building multi-chunk contexts locally. The
+    graph is built once, with the embeddings and neighbours of many chunks fetched from the document store in bulk and
+    on several threads at once, and can be saved and reused across runs. Only chunks in the graph are kept as
+    neighbours, so a graph built from the chunks of the training sources never links to other sources.
+    """
+
+    def __init__(self, ids: List[str], neighbours: np.ndarray, similarities: np.ndarray) -> None:
+        """Initialises the KNNGraph class. Use build to create a graph from a document store, or load to load a saved one.
+
+        Args:
+            ids (List[str]): The chunk id of every node.
+            neighbours (np.ndarray): Matrix with the nodes most similar to every node, most similar first, padded with -1.
+            similarities (np.ndarray): Matrix with the similarity of every node to each of its neighbours.
+        """
+        if not len(ids) == len(neighbours) == len(similarities):
+            raise ValueError("ids, neighbours and similarities must have the same length.")
+        self.ids = np.asarray(ids, dtype=object)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.similarities = np.asarray(similarities, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+            cls,
+            document_store_wrapper: "DocumentStoreWrapper",
+            chunks: List[Tuple[str, str]],
+            sources: Optional[List[str]],
+            k: int = 10,
+            chunk_size_threshold: Optional[int] = 200,
+            batch_size: int = 256,
+            max_workers: int = 4,
+        ) -> "KNNGraph":
+        """Build the graph over every chunk above chunk_size_threshold. Chunks are processed in batches, each batch
+        fetching its embeddings and neighbours with one call of get_chunk_embeddings and retrieve_similar_chunks_batch,
+        and batches are spread across max_workers threads, so the document store must be safe to call from threads.
+
+        Args:
+            document_store_wrapper (DocumentStoreWrapper): The document store to retrieve neighbours from.
+            chunks (List[Tuple[str, str]]): The chunks to build the graph over, in the form of (id, chunk).
+            sources (List[str]): List of sources to retrieve from, prevents data leakage during retrieval.
+            k (int): The number of neighbours kept for every chunk (default: 10).
+            chunk_size_threshold (int): The threshold for the size of the chunks kept in the graph (default: 200).
+            batch_size (int): The number of chunks whose neighbours are retrieved at once (default: 256).
+            max_workers (int): The number of batches processed at the same time (default: 4).
+
+        Returns:
+            KNNGraph: The graph built.
+        """
+        nodes = list(dict(
+            chunk for chunk in chunks if chunk_size_threshold is None or len(chunk[1]) > chunk_size_threshold
+        ).items())
+        rows = {chunk_id: row for row, (chunk_id, _) in enumerate(nodes)}
+        neighbours = np.full((len(nodes), k), -1, dtype=np.int32)
+        similarities = np.zeros((len(nodes), k), dtype=np.float32)
+
+        def process(start: int) -> int:
+            batch = nodes[start:start + batch_size]
+            embeddings = document_store_wrapper.get_chunk_embeddings(batch)
+            # One more neighbour than needed is retrieved, as every chunk is usually its own nearest neighbour
+            retrieved = document_store_wrapper.retrieve_similar_chunks_batch(embeddings, k + 1, sources)
+            scores = document_store_wrapper.neighbour_similarities(batch, embeddings, retrieved)
+            position = 0
+            for offset, ((chunk_id, _), similar_chunks) in enumerate(zip(batch, retrieved)):
+                row_scores = scores[position:position + len(similar_chunks)]
+                position += len(similar_chunks)
+                found = [
+                    (rows[chunk.id], score) for chunk, score in zip(similar_chunks, row_scores)
+                    if chunk.id in rows and chunk.id != chunk_id
+                ]
+                found.sort(key=lambda neighbour: -neighbour[1])
+                for column, (neighbour, score) in enumerate(found[:k]):
+                    neighbours[start + offset, column] = neighbour
+                    similarities[start + offset, column] = score
+            return len(batch)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=len(nodes), desc="Building kNN Graph") as pbar:
+            for processed in executor.map(process, range(0, len(nodes), batch_size)):
+                pbar.update(processed)
+        return cls([chunk_id for chunk_id, _ in nodes], neighbours, similarities)
+
+    def candidates(
+            self,
+            chunk_by_id: Dict[str, str],
+            similarity_threshold: Optional[float] = 0.5,
+            chunk_size_threshold: Optional[int] = 200,
+        ) -> Dict[str, List[Tuple[str, str]]]:
+        """Find the neighbours of every node that could join its context, most similar first.
+
+        Args:
+            chunk_by_id (Dict[str, str]): Mapping of chunk id to chunk, for the chunks contexts are built from. Nodes and
+                neighbours missing from it are left out.
+            similarity_threshold (float): The similarity a neighbour must be above (default: 0.5).
+            chunk_size_threshold (int): The size a neighbour must be above (default: 200).
+
+        Returns:
+            Dict[str, List[Tuple[str, str]]]: Mapping of the chunk id of every node to its candidate neighbours, in the
+                form of (id, chunk).
+        """
+        keep = self.neighbours >= 0
+        if similarity_threshold is not None:
+            keep &= self.similarities > similarity_threshold
+        candidates = {}
+        for row, chunk_id in enumerate(self.ids):
+            if chunk_id not in chunk_by_id:
+                continue
+            found = []
+            for neighbour in self.neighbours[row, keep[row]]:
+                neighbour_id = self.ids[neighbour]
+                text = chunk_by_id.get(neighbour_id)
+                if text is None or text == chunk_by_id[chunk_id]:
+                    continue
+                if chunk_size_threshold is not None and len(text) <= chunk_size_threshold:
+                    continue
+                found.append((neighbour_id, text))
+            candidates[chunk_id] = found
+        return candidates
+
+    def save(self, path: str) -> None:
+        """Save the graph as a .npz file.
+
+        Args:
+            path (str): The file path to save to.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'wb') as f:
+            np.savez(
+                f, ids=self.ids.astype(str), neighbours=self.neighbours, similarities=self.similarities
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "KNNGraph":
+        """Load a graph saved with save.
+
+        Args:
+            path (str): The file path the graph was saved to.
+
+        Returns:
+            KNNGraph: The graph loaded.
+        """
+        saved = np.load(path, allow_pickle=False)
+        return cls(saved["ids"].tolist(), saved["neighbours"], saved["similarities"])
@@ -0,0 +1,197 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import json
+import os
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+# Libs
+import numpy as np
+
+############################
+# Call Record - CallRecord #
+############################
+
+@dataclass
+class CallRecord:
+    """A single call to the language model."""
+    stage: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    retries: int
+
+############################
+# Run Metrics - RunMetrics #
+############################
+
+class RunMetrics:
+    """Records the stage, token usage, latency and retries of every call made to the language model, along with cache
+    hits and the wall time of each stage, so that it is clear which stage dominates the time and spend of a run. A
+    summary with per-stage p50/p95 latencies, token totals, estimated cost and tokens per accepted question can be
+    printed or saved as a JSON file.
+    """
+
+    def __init__(
+            self,
+            prompt_cost_per_1k_tokens: float = 0.0,
+            completion_cost_per_1k_tokens: float = 0.0,
+        ) -> None:
+        """Initialises the RunMetrics class.
+
+        Args:
+            prompt_cost_per_1k_tokens (float): Price of 1,000 prompt tokens, used to estimate cost (default: 0.0).
+            completion_cost_per_1k_tokens (float): Price of 1,000 completion tokens, used to estimate cost
+                (default: 0.0).
+        """
+        self.prompt_cost_per_1k_tokens = prompt_cost_per_1k_tokens
+        self.completion_cost_per_1k_tokens = completion_cost_per_1k_tokens
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear every recorded call, for eg. at the start of a new run."""
+        self.calls: List[CallRecord] = []
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+        self.stage_times: Dict[str, float] = defaultdict(float)
+
+    def record_call(
+            self,
+            stage: str,
+            prompt_tokens: int,
+            completion_tokens: int,
+            latency: float,
+            retries: int,
+        ) -> None:
+        """Record a call to the language model.
+
+        Args:
+            stage (str): The stage the call belongs to.
+            prompt_tokens (int): The number of prompt tokens used.
+            completion_tokens (int): The number of completion tokens used.
+            latency (float): The number of seconds the successful model call took, excluding quota waits and backoff.
+            retries (int): The number of times the call was retried.
+        """
+        with self.lock:
+            self.calls.append(CallRecord(stage, prompt_tokens, completion_tokens, latency, retries))
+
+    def record_cache_hits(self, stage: str, hits: int) -> None:
+        """Record prompts of a stage that were answered from the response cache.
+
+        Args:
+            stage (str): The stage the prompts belong to.
+            hits (int): The number of prompts answered from the cache.
+        """
+        with self.lock:
+            self.cache_hits[stage] += hits
+
+    def record_stage_time(self, stage: str, seconds: float) -> None:
+        """Add wall time spent running the prompts of a stage.
+
+        Args:
+            stage (str): The stage that ran.
+            seconds (float): The number of seconds taken.
+        """
+        with self.lock:
+            self.stage_times[stage] += seconds
+
+    def _cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.prompt_cost_per_1k_tokens
+                + completion_tokens * self.completion_cost_per_1k_tokens) / 1000
+
+    def summary(self, accepted_questions: Optional[int] = None) -> Dict:
+        """Summarise the recorded calls per stage and for the whole run.
+
+        Args:
+            accepted_questions (int): The number of questions in the final dataset, used to compute tokens and cost per
+                accepted question (default: None).
+
+        Returns:
+            Dict: Summary with a "stages" mapping of stage name to its metrics, and a "total" entry for the whole run.
+        """
+        with self.lock:
+            calls = list(self.calls)
+            cache_hits = dict(self.cache_hits)
+            stage_times = dict(self.stage_times)
+        by_stage = defaultdict(list)
+        for call in calls:
+            by_stage[call.stage].append(call)
+
+        def summarise(stage_calls: List[CallRecord]) -> Dict:
+            latencies = np.array([call.latency for call in stage_calls]) if stage_calls else np.zeros(1)
+            prompt_tokens = sum(call.prompt_tokens for call in stage_calls)
+            completion_tokens = sum(call.completion_tokens for call in stage_calls)
+            return {
+                "calls": len(stage_calls),
+                "retries": sum(call.retries for call in stage_calls),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": self._cost(prompt_tokens, completion_tokens),
+                "latency_p50": float(np.percentile(latencies, 50)),
+                "latency_p95": float(np.percentile(latencies, 95)),
+            }
+
+        stages = {}
+        for stage in sorted(set(by_stage) | set(cache_hits) | set(stage_times)):
+            stages[stage] = summarise(by_stage.get(stage, []))
+            stages[stage]["cache_hits"] = cache_hits.get(stage, 0)
+            stages[stage]["wall_time"] = stage_times.get(stage, 0.0)
+        total = summarise(calls)
+        total["cache_hits"] = sum(cache_hits.values())
+        total["wall_time"] = sum(stage_times.values())
+        if accepted_questions:
+            total["accepted_questions"] = accepted_questions
+            total["tokens_per_accepted_question"] = (
+                (total["prompt_tokens"] + total["completion_tokens"]) / accepted_questions
+            )
+            total["cost_per_accepted_question"] = total["cost"] / accepted_questions
+        return {"stages": stages, "total": total}
+
+    def report(self, accepted_questions: Optional[int] = None) -> str:
+        """Format the summary as a table with one line per stage.
+
+        Args:
+            accepted_questions (int): The number of questions in the final dataset (default: None).
+
+        Returns:
+            str: The report.
+        """
+        summary = self.summary(accepted_questions)
+        header = (
+            f"{'stage':<32}{'calls':>7}{'hits':>7}{'retries':>9}{'prompt tok':>12}{'compl tok':>11}"
+            f"{'p50 s':>8}{'p95 s':>8}{'wall s':>9}{'cost':>9}"
+        )
+        lines = ["Run metrics:", header]
+        for stage, metrics in list(summary["stages"].items()) + [("total", summary["total"])]:
+            lines.append(
+                f"{stage:<32}{metrics['calls']:>7}{metrics['cache_hits']:>7}{metrics['retries']:>9}"
+                f"{metrics['prompt_tokens']:>12}{metrics['completion_tokens']:>11}"
+                f"{metrics['latency_p50']:>8.2f}{metrics['latency_p95']:>8.2f}{metrics['wall_time']:>9.1f}"
+                f"{metrics['cost']:>9.3f}"
+            )
+        if "tokens_per_accepted_question" in summary["total"]:
+            lines.append(
+                f"Tokens per accepted question: {summary['total']['tokens_per_accepted_question']:.0f} "
+                f"({summary['total']['accepted_questions']} questions)"
+            )
+        return "\n".join(lines)
+
+    def save(self, path: str, accepted_questions: Optional[int] = None) -> None:
+        """Save the summary and every recorded call as a JSON file.
+
+        Args:
+            path (str): The file path to save to.
+            accepted_questions (int): The number of questions in the final dataset (default: None).
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self.lock:
+            calls = [asdict(call) for call in self.calls]
+        with open(path, 'w') as f:
+            json.dump({**self.summary(accepted_questions), "calls": calls}, f, indent=4)
@@ -0,0 +1,300 @@
+####################
+# Required Modules #
+####################
+
+# Generic/Built-in
+import string
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Libs
+import numpy as np
+
+####################################
+# Text Statistics - TextStatistics #
+####################################
+
+# Lookup tables from byte value to character class. Bytes above 127 belong to non-ASCII characters, which are counted as
+# alphanumeric so that text in other scripts is not mistaken for punctuation.
+_ALNUM = np.zeros(256, dtype=bool)
+_ALNUM[[ord(c) for c in string.ascii_letters + string.digits]] = True
+_ALNUM[128:] = True
+_DIGIT = np.zeros(256, dtype=bool)
+_DIGIT[[ord(c) for c in string.digits]] = True
+_PUNCTUATION = np.zeros(256, dtype=bool)
+_PUNCTUATION[[ord(c) for c in string.punctuation]] = True
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[ord(c) for c in string.whitespace]] = True
+_NEWLINE = ord('\n')
+_URL_PREFIX = np.frombuffer(b'http', dtype=np.uint8)
+
+@dataclass
+class TextStatistics:
+    """Per-chunk text statistics for a batch of chunks, computed once and shared by every pre-filter rule. Each
+    attribute is an array with one entry per chunk.
+    """
+    length: np.ndarray
+    alnum: np.ndarray
+    digits: np.ndarray
+    punctuation: np.ndarray
+    non_whitespace: np.ndarray
+    lines: np.ndarray
+    short_lines: np.ndarray
+    urls: np.ndarray
+
+    @classmethod
+    def from_texts(cls, texts: List[str], short_line_length: int = 30, block_size: int = 20000) -> "TextStatistics":
+        """Compute statistics for a batch of chunks. The chunks are joined into a single byte buffer, so that character
+        classes, line lengths and links are counted with array operations instead of Python loops. Large batches are
+        processed in blocks, which keeps the size of the intermediate arrays bounded.
+
+        Args:
+            texts (List[str]): The chunks to compute statistics for.
+            short_line_length (int): Lines with fewer bytes than this are counted as short lines (default: 30).
+            block_size (int): The number of chunks processed at once (default: 20000).
+
+        Returns:
+            TextStatistics: The statistics of the chunks.
+        """
+        if len(texts) > block_size:
+            blocks = [
+                cls.from_texts(texts[start:start + block_size], short_line_length, block_size)
+                for start in range(0, len(texts), block_size)
+            ]
+            return cls(**{
+                field: np.concatenate([getattr(block, field) for block in blocks])
+                for field in cls.__dataclass_fields__
+            })
+        encoded = [text.encode('utf-8') for text in texts]
+        lengths = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+        # Every chunk is terminated by a newline, so that each chunk ends its own last line
+        buffer = np.frombuffer(b'\n'.join(encoded) + b'\n', dtype=np.uint8)
+        ends = np.cumsum(lengths + 1)
+        starts = ends - lengths - 1
+
+        def count(low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            # Two character classes are counted in one pass by packing them into the low and high 32 bits. Each segment
+            # includes the chunk's terminating newline, so no segment is empty.
+            if not len(starts):
+                return starts, starts
+            packed = np.add.reduceat((low.astype(np.uint64) | (high.astype(np.uint64) << 32))[buffer], starts)
+            return (packed & 0xFFFFFFFF).astype(np.int64), (packed >> 32).astype(np.int64)
+
+        newline_positions = np.flatnonzero(buffer == _NEWLINE)
+        line_lengths = np.diff(np.concatenate(([-1], newline_positions))) - 1
+        line_chunks = np.searchsorted(ends, newline_positions, side='right')
+        # Blank lines (for eg. paragraph breaks) are not counted towards the number of lines
+        non_blank = line_lengths > 0
+        alnum, digits = count(_ALNUM, _DIGIT)
+        punctuation, whitespace = count(_PUNCTUATION, _WHITESPACE)
+        # Links are counted by where "http" starts, which never spans two chunks as they are separated by newlines
+        url_positions = np.flatnonzero(buffer[:-len(_URL_PREFIX)] == _URL_PREFIX[0])
+        for offset in range(1, len(_URL_PREFIX)):
+            url_positions = url_positions[buffer[url_positions + offset] == _URL_PREFIX[offset]]
+        return cls(
+            length=lengths,
+            alnum=alnum,
+            digits=digits,
+            punctuation=punctuation,
+            non_whitespace=lengths + 1 - whitespace,
+            lines=np.bincount(line_chunks[non_blank], minlength=len(texts)),
+            short_lines=np.bincount(
+                line_chunks[non_blank & (line_lengths < short_line_length)], minlength=len(texts)
+            ),
+            urls=np.bincount(np.searchsorted(ends, url_positions, side='right'), minlength=len(texts)),
+        )
+
+##################################
+# Abstract Class - PreFilterRule #
+##################################
+
+class PreFilterRule(ABC):
+    """Abstract class for pre-filter rules. A rule looks at a batch of chunks and their statistics and returns which
+    chunks are clearly unusable for generation. To add a new rule, create a class that inherits from this class and pass
+    it to ChunkPreFilter.
+    """
+    name: str = "rule"
+
+    @abstractmethod
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        """Decide which chunks to reject.
+
+        Args:
+            texts (List[str]): The chunks to check.
+            stats (TextStatistics): The statistics of the chunks.
+
+        Returns:
+            np.ndarray: Boolean array with True for every chunk that should be rejected.
+        """
+        raise NotImplementedError
+
+class AlphanumericRatioRule(PreFilterRule):
+    """Rejects chunks where too few of the non-whitespace characters are letters or digits, for eg. tables and
+    separators."""
+    name = "alphanumeric_ratio"
+
+    def __init__(self, min_ratio: float = 0.6) -> None:
+        self.min_ratio = min_ratio
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        return stats.alnum < self.min_ratio * np.maximum(stats.non_whitespace, 1)
+
+class DigitRatioRule(PreFilterRule):
+    """Rejects chunks where too many of the non-whitespace characters are digits, for eg. dates and page numbers in
+    reference lists."""
+    name = "digit_ratio"
+
+    def __init__(self, max_ratio: float = 0.3) -> None:
+        self.max_ratio = max_ratio
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        return stats.digits > self.max_ratio * np.maximum(stats.non_whitespace, 1)
+
+class PunctuationRatioRule(PreFilterRule):
+    """Rejects chunks where too many of the non-whitespace characters are punctuation, for eg. links and citations."""
+    name = "punctuation_ratio"
+
+    def __init__(self, max_ratio: float = 0.25) -> None:
+        self.max_ratio = max_ratio
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        return stats.punctuation > self.max_ratio * np.maximum(stats.non_whitespace, 1)
+
+class ShortLineRule(PreFilterRule):
+    """Rejects chunks made up mostly of short lines, for eg. tables of contents, headers and navigation menus."""
+    name = "short_lines"
+
+    def __init__(self, max_short_line_share: float = 0.7, min_lines: int = 5) -> None:
+        self.max_short_line_share = max_short_line_share
+        self.min_lines = min_lines
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        return (stats.lines >= self.min_lines) & (stats.short_lines > self.max_short_line_share * stats.lines)
+
+class UrlDensityRule(PreFilterRule):
+    """Rejects chunks with many links for their length, for eg. reference lists and archive notices."""
+    name = "url_density"
+
+    def __init__(self, max_urls_per_1000_chars: float = 4) -> None:
+        self.max_urls_per_1000_chars = max_urls_per_1000_chars
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        return stats.urls * 1000 > self.max_urls_per_1000_chars * np.maximum(stats.length, 1)
+
+class RepeatedNgramRule(PreFilterRule):
+    """Rejects chunks where a large share of the word n-grams are repeats, for eg. boilerplate and repeated headers.
+    Only the first max_words words of each chunk are checked, which keeps the rule fast on long chunks. Unlike the other
+    rules, n-grams are counted chunk by chunk in Python, so this rule is not part of the default rules."""
+    name = "repeated_ngrams"
+
+    def __init__(self, n: int = 3, max_repeated_share: float = 0.5, min_words: int = 20, max_words: int = 256) -> None:
+        self.n = n
+        self.max_repeated_share = max_repeated_share
+        self.min_words = min_words
+        self.max_words = max_words
+
+    def _repeated_share(self, text: str) -> float:
+        words = text.lower().split(maxsplit=self.max_words)[:self.max_words]
+        if len(words) < self.min_words:
+            return 0.0
+        ngrams = list(zip(*(words[i:] for i in range(self.n))))
+        return 1 - len(set(ngrams)) / len(ngrams)
+
+    def reject(self, texts: List[str], stats: TextStatistics) -> np.ndarray:
+        shares = np.fromiter((self._repeated_share(text) for text in texts), dtype=np.float64, count=len(texts))
+        return shares > self.max_repeated_share
+
+###############################
+# Pre-filter - ChunkPreFilter #
+###############################
+
+class ChunkPreFilter:
+    """Cheap local filter that runs before chunks are sent to the language model for evaluation. Chunks that are clearly
+    metadata, such as tables of contents, headers, reference lists or boilerplate, are rejected using text statistics
+    computed over the whole batch at once, and never cost an LLM call. Rules are applied in order, with each rule only
+    seeing the chunks that passed the rules before it, and the number of chunks rejected by each rule is counted.
+    """
+
+    def __init__(
+            self,
+            rules: Optional[List[PreFilterRule]] = None,
+            short_line_length: int = 30,
+        ) -> None:
+        """Initialises the ChunkPreFilter class.
+
+        Args:
+            rules (List[PreFilterRule]): The rules to apply, cheapest first. Defaults to rules on the alphanumeric,
+                digit and punctuation ratios, short lines and link density, which are all computed with array
+                operations. Add a RepeatedNgramRule to also reject repeated word trigrams.
+            short_line_length (int): Lines with fewer bytes than this are counted as short lines (default: 30).
+        """
+        if rules is None:
+            rules = [
+                AlphanumericRatioRule(),
+                DigitRatioRule(),
+                PunctuationRatioRule(),
+                ShortLineRule(),
+                UrlDensityRule(),
+            ]
+        self.rules = rules
+        self.short_line_length = short_line_length
+        self.rejections: Dict[str, int] = defaultdict(int)
+        self.checked = 0
+
+    def reject_mask(self, texts: List[str]) -> np.ndarray:
+        """Decide which chunks to reject, and count the rejections of each rule.
+
+        Args:
+            texts (List[str]): The chunks to check.
+
+        Returns:
+            np.ndarray: Boolean array with True for every chunk that should be rejected.
+        """
+        rejected = np.zeros(len(texts), dtype=bool)
+        if not texts:
+            return rejected
+        stats = TextStatistics.from_texts(texts, short_line_length=self.short_line_length)
+        remaining = np.arange(len(texts))
+        for rule in self.rules:
+            if len(remaining) == 0:
+                break
+            subset_texts = [texts[i] for i in remaining]
+            subset_stats = TextStatistics(**{
+                field: getattr(stats, field)[remaining] for field in TextStatistics.__dataclass_fields__
+            })
+            rule_rejects = rule.reject(subset_texts, subset_stats)
+            self.rejections[rule.name] += int(rule_rejects.sum())
+            rejected[remaining[rule_rejects]] = True
+            remaining = remaining[~rule_rejects]
+        self.checked += len(texts)
+        return rejected
+
+    def filter(self, texts: List[str]) -> List[bool]:
+        """Check which chunks pass the pre-filter.
+
+        Args:
+            texts (List[str]): The chunks to check.
+
+        Returns:
+            List[bool]: True for every chunk that passed, in the same order as the chunks.
+        """
+        return (~self.reject_mask(texts)).tolist()
+
+    def reset_stats(self) -> None:
+        """Reset the rejection counts, for eg. at the start of a new run."""
+        self.rejections.clear()
+        self.checked = 0
+
+    def report(self) -> str:
+        """Summarise the number of chunks rejected by each rule since the counts were last reset.
+
+        Returns:
+            str: A report with one line per rule.
+        """
+        total = sum(self.rejections.values())
+        lines = [f"Pre-filter: {total} of {self.checked} chunks rejected without an LLM call."]
+        for rule in self.rules:
+            lines.append(f"  {rule.name}: {self.rejections[rule.name]}")
+        return "\n".join(lines)
@@ -53,6 +53,48 @@ def format_evaluate_chunk_template(chunk: str) -> str:
     Output:
     """
 
+def format_evaluate_chunks_batch_template(chunks: List[str]) -> str:
+    chunk_strings = "\n\n    ".join([f"Chunk {i + 1}: {chunk}" for i, chunk in enumerate(chunks)])
+    return f"""Given a numbered list of chunks, complete the following task for every chunk and return the results as a
+    JSON array. Evaluate each chunk on its own and assign a numerical score of either 0 (Low) of 1 (High) for each of 
+    the following criteria:
+
+    - **self_containment**: Evaluate whether the chunk provides enough information to be understood on its own, 
+    without requiring additional external knowledge. If the chunk mentions an individual, or an organisation, the 
+    identity of either entity must be clear in a self-contained chunk. A score of 1 indicates the chunk is complete 
+    and self-contained, while a score of 0 reflects the need for further information.
+    - **not_metadata**: Evaluate whether the chunk primarily consists of citations, links, dates, or other structural
+    or metadata elements. A score of 0 indicates that the chunk contains primarily metadata, while a score of 1
+    indicates that the chunk contains primarily content.
+
+    **
+    IMPORTANT: Please make sure to only return a JSON array with exactly one dictionary per chunk, in the same order as
+    the chunks. Each dictionary must have the 'id', 'self_containment' and 'not_metadata' keys, where 'id' is the number
+    of the chunk. Be strict in your evaluation. It is better to have a lower score (0) than to be lenient in your 
+    evaluation.
+
+    Example chunks:
+    Chunk 1: "Retrieved 2010-08-10. 35. T. Krovetz, W. Dai (2010). "How to get fast AES calls?" (https://groups.google.com/group/crypto pp-users/msg/a688203c2314ef08). Crypto++ user group. Retrieved 2010-08-11. 36. "Crypto++ 5.6.0 Pentium 4 Benchmarks" (http://www.cryptopp.com/benchmarks-p4.html). Crypto++ Website. 2009. Archived (https://web.archive.org/web/20100919121759/http://cryptop p.com/benchmarks-p4.html) from the original on 19 September 2010. Retrieved 2010-08-10."
+
+    Chunk 2: "I loved music and thought I could be very good, but I knew I would never be John Coltrane or Stan Getz. I was interested in medicine and thought I could be a fine doctor, but I knew I would never be Michael DeBakey."
+
+    Chunk 3: "[309] The William J. Clinton Presidential Center and Park in Little Rock, Arkansas, was dedicated in 2004.[310] Clinton released a best-selling autobiography, My Life, in 2004.[311] In 2007, he released Giving: How Each of Us Can Change the World, which also became a New York Times Best Seller and garnered positive reviews.[312] In the aftermath of the 2004 Asian tsunami, U.N."
+
+    Example output: [{{"id": 1, "self_containment": 1, "not_metadata": 0}}, {{"id": 2, "self_containment": 0, "not_metadata": 1}}, {{"id": 3, "self_containment": 1, "not_metadata": 1}}]
+    Reason: Chunk 1 has a large number of website urls, numbers and dates, which suggest that it is primarily metadata.
+    It is unclear who the individuals mentioned in chunk 2 are, hence chunk 2 is not self-contained. Chunk 3 is 
+    self-contained and does not contain metadata.
+
+    Your output MUST only be a JSON array following the above format. Do not add any additional information to your 
+    response.
+    **
+
+    Chunks:
+    {chunk_strings}
+
+    Output:
+    """
+
 def format_context_query_template(context: List[List[Tuple[str, str]]], chunks_per_context: int) -> str:
     context = "SEPARATOR \n".join([f"{chunk[1]}\n" for chunk in context])
     prompt = f"""You are a curious student who is great at asking inquisitive questions. Your task is to come up with